@@ -0,0 +1,8 @@
+"""Benchmarks for the super_project and examples apps.
+
+Run them from the repository root, for example:
+
+    python -m benchmarks.group_commit
+
+Every benchmark prints its results as JSON so runs can be diffed.
+"""
@@ -0,0 +1,101 @@
+"""A tiny in-process ASGI client.
+
+Requests go straight into the app, no sockets or HTTP parsing involved, so
+the numbers measure the application and nothing else.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Response:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.raw_headers = headers
+        self.body = body
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {name.decode().lower(): value.decode() for name, value in self.raw_headers}
+
+
+class ASGIClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def startup(self):
+        await self.app.router.startup()
+
+    async def shutdown(self):
+        await self.app.router.shutdown()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        chunk_size: int = 64 * 1024,
+    ) -> Response:
+        parts = urlsplit(url)
+        raw_headers = [(b"host", b"testserver")]
+        raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        if body:
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+        chunks.reverse()
+        response_done = asyncio.Event()
+        status = 500
+        response_headers = []
+        response_body = []
+
+        async def receive():
+            if chunks:
+                chunk = chunks.pop()
+                return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        response_done.set()
+        return Response(status, response_headers, b"".join(response_body))
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+
+def multipart(field: str, filename: str, content: bytes, boundary: str = "benchmarkboundary"):
+    """Encode a single file field, returns (headers, body)"""
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return {"content-type": f"multipart/form-data; boundary={boundary}"}, body
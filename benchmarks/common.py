@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def use_super_project(database: str = None, **settings):
+    """Make `app` importable and point it at `database`, a throwaway sqlite
+    file by default.
+
+    Must run before anything from `app` is imported, the settings are read
+    from APP_* environment variables at import time.
+    """
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix="bench-"), "app_db.db")
+    database = os.path.abspath(database)
+    os.environ.setdefault("APP_DATABASE_URL", f"sqlite:///{database}")
+    os.environ.setdefault("APP_ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{database}")
+    for name, value in settings.items():
+        os.environ[f"APP_{name.upper()}"] = str(value)
+    sys.path.insert(0, str(ROOT / "super_project"))
+    return database
+
+
+def use_examples(**environ):
+    """Make the example modules importable, they are run from their own folder.
+
+    `environ` is exported before the import, eg. AUTH_LOGIN_RATE_PER_IP=0.
+    """
+    for name, value in environ.items():
+        os.environ.setdefault(name, str(value))
+    sys.path.insert(0, str(ROOT / "examples"))
+
+
+def sqlite_url(name: str) -> str:
+    return "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench-"), name)
+
+
+def percentiles(samples: list) -> dict:
+    """Latency summary in milliseconds of a list of durations in seconds"""
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+    return {
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "max": round(ordered[-1] * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def report(name: str, results: dict, output: str = None):
+    text = json.dumps({"benchmark": name, **results}, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,102 @@
+"""CPU cost against bytes saved of CompressionMiddleware.
+
+Seeds users with items and requests the big list routes and the NDJSON
+export once through the middleware per encoding, to check what it sends.
+Then each body is compressed again with every encoding and level, the
+export line by line the way the middleware sees it. Reports size, ratio and
+CPU per compression next to the CPU the request itself takes. A response
+cache storing the compressed variant pays that compression once.
+
+    python -m benchmarks.compression --users 2000 --items-per-user 5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.asgi import ASGIClient
+from benchmarks.common import report, use_super_project
+
+use_super_project(compression=False)
+
+from app import models  # noqa: E402
+from app.compression import CompressionMiddleware, Compressor, brotli  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+URLS = ["/users/?limit=1000", "/items/?limit=5000", "/export/items"]
+
+
+def seed(users: int, items_per_user: int):
+    db = SessionLocal()
+    try:
+        for n in range(users):
+            db.add(models.User(
+                email=f"user{n}@example.com",
+                hashed_password="notreallyhashed",
+                items=[
+                    models.Item(title=f"Item {n}.{i}", description=f"description of item {i} of user {n}")
+                    for i in range(items_per_user)
+                ],
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def variants():
+    for level in (1, 6, 9):
+        yield f"gzip-{level}", "gzip", {"gzip_level": level}
+    if brotli is not None:
+        for quality in (1, 4, 11):
+            yield f"br-{quality}", "br", {"brotli_quality": quality}
+
+
+def compress_ms(chunks: list, encoding: str, options: dict, rounds: int):
+    start = time.process_time()
+    for _ in range(rounds):
+        compressor = Compressor(encoding, options.get("gzip_level", 6), options.get("brotli_quality", 4))
+        body = b"".join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+    return body, (time.process_time() - start) / rounds * 1000
+
+
+async def run(rounds: int) -> dict:
+    client = ASGIClient(app)
+    results = {}
+    for url in URLS:
+        start = time.process_time()
+        plain = await client.get(url)
+        request_ms = (time.process_time() - start) * 1000
+        # NDJSON arrives one row per message, lists as a single body
+        chunks = plain.body.splitlines(keepends=True) if url.startswith("/export") else [plain.body]
+        rows = {"identity": {"bytes": len(plain.body), "request_cpu_ms": round(request_ms, 3)}}
+        for name, encoding, options in variants():
+            sent = await ASGIClient(CompressionMiddleware(app, **options)).get(url, headers={"accept-encoding": encoding})
+            assert sent.headers.get("content-encoding") == encoding, sent.headers
+            body, cpu_ms = compress_ms(chunks, encoding, options, rounds)
+            rows[name] = {
+                "bytes": len(body),
+                "ratio": round(len(plain.body) / len(body), 2),
+                "compress_cpu_ms": round(cpu_ms, 3),
+            }
+        results[url] = rows
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--items-per-user", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    seed(args.users, args.items_per_user)
+    report("compression", {
+        "users": args.users,
+        "items_per_user": args.items_per_user,
+        "brotli": brotli is not None,
+        "routes": asyncio.run(run(args.rounds)),
+    })
+
+
+if __name__ == "__main__":
+    main()
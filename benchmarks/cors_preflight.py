@@ -0,0 +1,74 @@
+"""Preflight throughput of starlette's CORSMiddleware against CachedCORSMiddleware.
+
+    python -m benchmarks.cors_preflight --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.asgi import ASGIClient
+from benchmarks.common import report, use_examples
+
+use_examples()
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+
+from cors_example import CORS_MAX_AGE, CachedCORSMiddleware, origins  # noqa: E402
+
+PREFLIGHT = {
+    "origin": "http://localhost:8080",
+    "access-control-request-method": "POST",
+    "access-control-request-headers": "content-type, x-token",
+}
+
+
+def make_app(middleware):
+    app = FastAPI()
+    app.add_middleware(
+        middleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        max_age=CORS_MAX_AGE,
+    )
+
+    @app.post("/items/")
+    async def create_item():
+        return {}
+
+    return app
+
+
+async def measure(app, requests: int) -> dict:
+    client = ASGIClient(app)
+    response = await client.request("OPTIONS", "/items/", headers=PREFLIGHT)
+    assert response.status == 200, response.body
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.request("OPTIONS", "/items/", headers=PREFLIGHT)
+    elapsed = time.perf_counter() - start
+    return {
+        "preflights_per_second": round(requests / elapsed, 1),
+        "us_per_preflight": round(elapsed / requests * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    starlette = asyncio.run(measure(make_app(CORSMiddleware), args.requests))
+    cached = asyncio.run(measure(make_app(CachedCORSMiddleware), args.requests))
+    report("cors_preflight", {
+        "requests": args.requests,
+        "starlette_cors": starlette,
+        "cached_cors": cached,
+        "speedup": round(cached["preflights_per_second"] / starlette["preflights_per_second"], 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Inserts per second with and without the write coalescer.
+
+    python -m benchmarks.group_commit --threads 32 --rows 4000
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import report, sqlite_url, use_super_project
+
+use_super_project()
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.writes import WriteCoalescer  # noqa: E402
+
+
+def make_engine():
+    engine = create_engine(
+        sqlite_url("group_commit.db"), connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def run(insert, threads: int, rows: int) -> dict:
+    users = [
+        schemas.UserCreate(email=f"user{n}@example.com", password="password")
+        for n in range(rows)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(insert, users))
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(elapsed, 3), "inserts_per_second": round(rows / elapsed, 1)}
+
+
+def per_row(threads: int, rows: int) -> dict:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=make_engine())
+
+    def insert(user):
+        db = SessionLocal()
+        try:
+            return crud.create_user(db, user)
+        finally:
+            db.close()
+
+    return run(insert, threads, rows)
+
+
+def coalesced(threads: int, rows: int, window: float, max_batch: int) -> dict:
+    WriteSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=make_engine())
+    writer = WriteCoalescer(WriteSessionLocal, window=window, max_batch=max_batch)
+    writer.start()
+    try:
+        return run(lambda user: writer.add(lambda: crud.build_user(user)), threads, rows)
+    finally:
+        writer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    baseline = per_row(args.threads, args.rows)
+    grouped = coalesced(args.threads, args.rows, args.window_ms / 1000, args.max_batch)
+    report("group_commit", {
+        "threads": args.threads,
+        "per_row_commit": baseline,
+        "coalesced": grouped,
+        "speedup": round(grouped["inserts_per_second"] / baseline["inserts_per_second"], 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""ItemRepository against the plain list of dicts it replaces, at 1M records.
+
+Reports build time and memory of both stores, then the time per call of a
+deep skip/limit page, a tag filter, a price range, a point lookup and an
+update.
+
+    python -m benchmarks.item_repository --records 1000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import report, use_examples
+
+use_examples()
+
+from repository import ItemRepository  # noqa: E402
+
+TAGS = [f"tag{n}" for n in range(50)]
+
+
+def make_rows(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        (f"item{n}", {
+            "name": f"Item {n}",
+            "description": None if n % 3 else "lorem ipsum",
+            "price": round(rng.uniform(1, 1000), 2),
+            "tax": None,
+            "tags": rng.sample(TAGS, 2),
+        })
+        for n in range(count)
+    ]
+
+
+def measure_build(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, elapsed, size
+
+
+def per_call_ms(func, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return round((time.perf_counter() - start) / rounds * 1000, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.records)
+    # the dict store gets its own copies, the repository only keeps the values
+    dicts, dict_build, dict_bytes = measure_build(
+        lambda: [{"id": item_id, **fields} for item_id, fields in rows])
+    repository, repo_build, repo_bytes = measure_build(
+        lambda: ItemRepository.from_dict(dict(rows)))
+    by_id = {row["id"]: row for row in dicts}
+
+    skip = args.records - args.page * 2
+    page = args.page
+
+    def scan_tag():
+        return [row for row in dicts if "tag7" in row["tags"]][skip // 50:skip // 50 + page]
+
+    def scan_price():
+        matched = [row for row in dicts if 100 <= row["price"] <= 110]
+        return sorted(matched, key=lambda row: row["price"])[:page]
+
+    last_id = f"item{args.records - 1}"
+    results = {
+        "records": args.records,
+        "build_s": {"dicts": round(dict_build, 2), "repository": round(repo_build, 2)},
+        "memory_mb": {"dicts": round(dict_bytes / 2**20, 1), "repository": round(repo_bytes / 2**20, 1)},
+        "deep_page_ms": {
+            "dicts": per_call_ms(lambda: dicts[skip:skip + page], args.rounds),
+            "repository": per_call_ms(lambda: repository.list(skip, page), args.rounds),
+        },
+        "tag_ms": {
+            "scan": per_call_ms(scan_tag, max(1, args.rounds // 10)),
+            "repository": per_call_ms(lambda: repository.with_tag("tag7", skip // 50, page), args.rounds),
+        },
+        "price_range_ms": {
+            "scan": per_call_ms(scan_price, max(1, args.rounds // 10)),
+            "repository": per_call_ms(lambda: repository.price_between(100, 110, 0, page), args.rounds),
+        },
+        "lookup_ms": {
+            "dicts": per_call_ms(lambda: by_id[last_id], args.rounds),
+            "repository": per_call_ms(lambda: repository.get(last_id), args.rounds),
+        },
+        "update_price_ms": per_call_ms(
+            lambda: repository.update(last_id, {"price": random.uniform(1, 1000)}), args.rounds),
+    }
+    report("item_repository", results)
+
+
+if __name__ == "__main__":
+    main()
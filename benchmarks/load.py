@@ -0,0 +1,198 @@
+"""Load suite for the super_project CRUD routes and the examples apps.
+
+Seeds the database, then drives every scenario in-process through the ASGI
+apps with a fixed number of concurrent clients and reports latency
+percentiles and throughput as JSON.
+
+    python -m benchmarks.load --users 1000 --items-per-user 5 --requests 500 --concurrency 16
+    python -m benchmarks.load --only users_list,items_list --output before.json
+    python -m benchmarks.load --users 20000 --only items_page_offset_first,items_page_offset_deep,items_page_cursor_first,items_page_cursor_deep
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import platform
+import time
+
+from benchmarks.asgi import ASGIClient, multipart
+from benchmarks.common import percentiles, report, use_examples, use_super_project
+
+AUTH_USERNAME = "johndoe"
+AUTH_PASSWORD = "secret"
+
+
+def seed(users: int, items_per_user: int):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        offset = db.query(models.User).count()
+        db.bulk_insert_mappings(models.User, [
+            {"email": f"seed{offset + n}@example.com", "hashed_password": "notreallyhashed", "is_active": True}
+            for n in range(users)
+        ])
+        user_ids = [row.id for row in db.query(models.User.id).order_by(models.User.id.desc()).limit(users)]
+        db.bulk_insert_mappings(models.Item, [
+            {"title": f"Item {n}", "description": "seeded by benchmarks.load", "owner_id": user_id}
+            for user_id in user_ids
+            for n in range(items_per_user)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_scenario(client: ASGIClient, make_request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(counter) < requests:
+            start = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def deep_page_start(page: int):
+    """Offset of the last full page of items and the cursor pointing at it"""
+    from app import models
+    from app.database import SessionLocal
+    from app.pagination import encode_cursor
+
+    db = SessionLocal()
+    try:
+        offset = max(0, db.query(models.Item).count() - page)
+        before = db.query(models.Item.id).order_by(models.Item.id).offset(offset - 1).limit(1).scalar() if offset else 0
+    finally:
+        db.close()
+    return offset, encode_cursor(before)
+
+
+def super_project_scenarios(page: int):
+    from app.main import app
+
+    emails = itertools.count()
+    # the same last page reached both ways, OFFSET scans every row before it,
+    # the cursor seeks straight to it, so only the offset one grows with depth
+    deep_offset, deep_cursor = deep_page_start(page)
+
+    def create_user(client):
+        body = b'{"email": "load%d@example.com", "password": "password"}' % next(emails)
+        return client.post("/users/", headers={"content-type": "application/json"}, body=body)
+
+    return app, {
+        "users_create": create_user,
+        "users_list": lambda client: client.get(f"/users/?limit={page}"),
+        "items_list": lambda client: client.get(f"/items/?limit={page}"),
+        "items_page_offset_first": lambda client: client.get(f"/items/?skip=0&limit={page}"),
+        "items_page_offset_deep": lambda client: client.get(f"/items/?skip={deep_offset}&limit={page}"),
+        "items_page_cursor_first": lambda client: client.get(f"/items/?cursor=&limit={page}"),
+        "items_page_cursor_deep": lambda client: client.get(f"/items/?cursor={deep_cursor}&limit={page}"),
+    }
+
+
+async def auth_scenarios():
+    import auth
+
+    form = {"content-type": "application/x-www-form-urlencoded"}
+    body = f"username={AUTH_USERNAME}&password={AUTH_PASSWORD}".encode()
+    client = ASGIClient(auth.app)
+    await client.startup()
+    try:
+        token = (await client.post("/token", headers=form, body=body)).body
+    finally:
+        await client.shutdown()
+    bearer = {"authorization": "Bearer " + token.decode().split('"access_token":"')[1].split('"')[0]}
+
+    return auth.app, {
+        "auth_token": lambda client: client.post("/token", headers=form, body=body),
+        "auth_users_me": lambda client: client.get("/users/me", headers=bearer),
+    }
+
+
+def upload_scenarios(upload_size: int):
+    import main
+
+    headers, body = multipart("file", "payload.bin", b"x" * upload_size)
+    return main.app, {
+        "upload_files": lambda client: client.post("/files/", headers=headers, body=body),
+        "upload_uploadfile": lambda client: client.post("/uploadfile/", headers=headers, body=body),
+    }
+
+
+async def run(args) -> dict:
+    results = {}
+    # bcrypt makes every /token request cost ~200ms, it gets its own, smaller, request count
+    request_counts = {"auth_token": args.slow_requests}
+
+    super_app, super_cases = super_project_scenarios(args.page)
+    auth_app, auth_cases = await auth_scenarios()
+    upload_app, upload_cases = upload_scenarios(args.upload_size)
+    for app, cases in ((super_app, super_cases), (auth_app, auth_cases), (upload_app, upload_cases)):
+        client = ASGIClient(app)
+        await client.startup()
+        try:
+            for name, make_request in cases.items():
+                if args.only and name not in args.only:
+                    continue
+                results[name] = await run_scenario(
+                    client, make_request, request_counts.get(name, args.requests), args.concurrency)
+        finally:
+            await client.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="sqlite file to seed, a throwaway one by default")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items-per-user", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--slow-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--upload-size", type=int, default=1024 * 1024)
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), default=None)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # per statement slow-query logging would dominate the numbers under load
+    database = use_super_project(database=args.database, slow_query_ms=0)
+    # every simulated client logs in as the same user from the same address
+    use_examples(AUTH_LOGIN_RATE_PER_USER=0, AUTH_LOGIN_RATE_PER_IP=0)
+    from app.main import app  # noqa: F401 creates the tables
+
+    seed(args.users, args.items_per_user)
+    # the example apps print on every request, keep stdout for the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(run(args))
+    report("load", {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": database,
+        "seed": {"users": args.users, "items_per_user": args.items_per_user},
+        "scenarios": results,
+    }, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
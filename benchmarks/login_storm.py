@@ -0,0 +1,102 @@
+"""/users/me latency while /token requests hammer bcrypt.
+
+Measures /users/me alone, then during a storm of concurrent logins with
+bcrypt on the worker pool, then during the same storm with bcrypt run
+inline on the event loop (the old behaviour) for comparison.
+
+    python -m benchmarks.login_storm --logins 16 --probes 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.asgi import ASGIClient
+from benchmarks.common import percentiles, report, use_examples
+
+# every simulated client logs in as the same user from the same address
+use_examples(AUTH_LOGIN_RATE_PER_USER=0, AUTH_LOGIN_RATE_PER_IP=0)
+
+import auth  # noqa: E402
+
+FORM = {"content-type": "application/x-www-form-urlencoded"}
+LOGIN = b"username=johndoe&password=secret"
+
+
+async def probe(client, bearer, probes: int, interval: float):
+    """Latency is counted from when the probe was due, so time spent waiting
+    for a blocked event loop shows up in the numbers
+    """
+    latencies = []
+    for _ in range(probes):
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await client.get("/users/me", headers=bearer)
+        latencies.append(time.perf_counter() - due)
+        assert response.status == 200, response.body
+    return percentiles(latencies)
+
+
+async def measure(client, bearer, logins: int, probes: int, interval: float):
+    stop = False
+
+    async def login_loop():
+        while not stop:
+            await client.post("/token", headers=FORM, body=LOGIN)
+
+    storm = [asyncio.create_task(login_loop()) for _ in range(logins)]
+    try:
+        return await probe(client, bearer, probes, interval)
+    finally:
+        stop = True
+        await asyncio.gather(*storm)
+
+
+async def run(args) -> dict:
+    client = ASGIClient(auth.app)
+    await client.startup()
+    try:
+        return await run_phases(client, args)
+    finally:
+        await client.shutdown()
+
+
+async def run_phases(client, args) -> dict:
+    token = (await client.post("/token", headers=FORM, body=LOGIN)).body.decode()
+    bearer = {"authorization": "Bearer " + token.split('"access_token":"')[1].split('"')[0]}
+
+    results = {"idle": await probe(client, bearer, args.probes, args.interval)}
+    results["storm_offloaded"] = await measure(client, bearer, args.logins, args.probes, args.interval)
+
+    offloaded = auth.run_hashing
+
+    async def inline(func, *func_args):
+        return func(*func_args)
+
+    auth.run_hashing = inline
+    try:
+        results["storm_inline"] = await measure(client, bearer, args.logins, args.probes, args.interval)
+    finally:
+        auth.run_hashing = offloaded
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=16, help="concurrent clients calling /token")
+    parser.add_argument("--probes", type=int, default=100, help="/users/me requests per phase")
+    parser.add_argument("--interval", type=float, default=0.005)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(run(args))
+    report("login_storm", {
+        "hash_workers": auth.HASH_WORKERS,
+        "concurrent_logins": args.logins,
+        "users_me_latency_ms": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Partial update of a large nested Product-style record, the copy/update
+recipe update_item used before against patching.apply_patch.
+
+    python -m benchmarks.patching --images 200 --tags 500 --rounds 2000
+"""
+import argparse
+import time
+from typing import Dict, List, Union
+
+from benchmarks.common import report, use_examples
+
+use_examples(AUTH_LOGIN_RATE_PER_USER=0, AUTH_LOGIN_RATE_PER_IP=0)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from main import Image, Product  # noqa: E402
+from patching import apply_patch  # noqa: E402
+
+
+class Variant(BaseModel):
+    sku: str
+    price: float
+    image: Union[Image, None] = None
+
+
+class CatalogProduct(Product):
+    images: List[Image] = []
+    variants: List[Variant] = []
+    attributes: Dict[str, str] = {}
+
+
+def make_record(images: int, tags: int) -> dict:
+    return jsonable_encoder(CatalogProduct(
+        name="Catalog product",
+        description="lorem ipsum " * 20,
+        price=42.0,
+        tax=3.2,
+        tags={f"tag{n}" for n in range(tags)},
+        image={"url": "http://example.com/main.png", "name": "main"},
+        images=[{"url": f"http://example.com/{n}.png", "name": f"image {n}"} for n in range(images)],
+        variants=[
+            {"sku": f"SKU-{n}", "price": 40 + n, "image": {"url": f"http://example.com/v{n}.png", "name": f"v{n}"}}
+            for n in range(images // 2)
+        ],
+        attributes={f"attribute{n}": f"value {n}" for n in range(images)},
+    ))
+
+
+def copy_update(store: dict, body: dict):
+    # what update_item did, including FastAPI validating the request body
+    item = CatalogProduct(**body)
+    stored_model = CatalogProduct(**store["item"])
+    update_data = stored_model.copy(update=item.dict(exclude_unset=True))
+    store["item"] = jsonable_encoder(update_data)
+
+
+def engine_update(store: dict, body: dict):
+    apply_patch(CatalogProduct, store["item"], body)
+
+
+def per_call_us(update, record: dict, patches: List[dict], rounds: int) -> float:
+    store = {"item": dict(record)}
+    start = time.perf_counter()
+    for n in range(rounds):
+        update(store, patches[n % len(patches)])
+    return round((time.perf_counter() - start) / rounds * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    record = make_record(args.images, args.tags)
+    # the old body has to carry the required fields and whole nested objects,
+    # the merge patch only what changes
+    scenarios = {
+        "scalar": (
+            [{"name": "Catalog product", "price": price} for price in (10.5, 11.5)],
+            [{"price": price} for price in (10.5, 11.5)],
+        ),
+        "nested": (
+            [{"name": "Catalog product", "price": 42.0, "image": {**record["image"], "name": name}}
+             for name in ("main a", "main b")],
+            [{"image": {"name": name}} for name in ("main a", "main b")],
+        ),
+    }
+    results = {"images": args.images, "tags": args.tags}
+    for name, (bodies, patches) in scenarios.items():
+        old = per_call_us(copy_update, record, bodies, args.rounds)
+        new = per_call_us(engine_update, record, patches, args.rounds)
+        results[name] = {"copy_update_us": old, "patch_engine_us": new, "speedup": round(old / new, 1)}
+    report("patching", results)
+
+
+if __name__ == "__main__":
+    main()
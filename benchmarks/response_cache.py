@@ -0,0 +1,72 @@
+"""Cached GET routes of examples/main.py with the response cache off and on.
+
+Requests each cached route in turn, first with a cache that keeps nothing,
+then warm, then revalidating with If-None-Match.
+
+    python -m benchmarks.response_cache --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.asgi import ASGIClient
+from benchmarks.common import report, use_examples
+
+use_examples(AUTH_LOGIN_RATE_PER_USER=0, AUTH_LOGIN_RATE_PER_IP=0)
+
+from main import app  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+
+URLS = [
+    "/models/lenet",
+    "/list_items/",
+    "/get_description/",
+    "/get_item/bar",
+    "/get_json_item/bar",
+]
+
+
+async def measure(client, requests: int, revalidate: bool = False) -> dict:
+    etags = {}
+    for url in URLS:
+        response = await client.get(url)
+        etags[url] = response.headers["etag"]
+    start = time.perf_counter()
+    for n in range(requests):
+        url = URLS[n % len(URLS)]
+        headers = {"if-none-match": etags[url]} if revalidate else {}
+        await client.get(url, headers=headers)
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "us_per_request": round(elapsed / requests * 1e6, 2),
+    }
+
+
+async def run(requests: int) -> dict:
+    client = ASGIClient(app)
+    max_entries = response_cache.max_entries
+    response_cache.max_entries = 0
+    response_cache.clear()
+    uncached = await measure(client, requests)
+    response_cache.max_entries = max_entries
+    cached = await measure(client, requests)
+    not_modified = await measure(client, requests, revalidate=True)
+    return {
+        "requests": requests,
+        "uncached": uncached,
+        "cached": cached,
+        "if_none_match": not_modified,
+        "speedup": round(cached["requests_per_second"] / uncached["requests_per_second"], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    report("response_cache", asyncio.run(run(args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Parity check and timing of the APP_FAST_JSON list path.
+
+Seeds users with items, requests the same pages through the response_model
+path and the orjson path, fails if the bodies differ by a single byte and
+reports the time spent per page.
+
+    python -m benchmarks.serialization --users 2000 --items-per-user 5 --page 1000
+"""
+import argparse
+import time
+
+from benchmarks.common import report, use_super_project
+
+use_super_project()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def seed(users: int, items_per_user: int):
+    db = SessionLocal()
+    try:
+        for n in range(users):
+            db.add(models.User(
+                email=f"user{n}@example.com",
+                hashed_password="notreallyhashed",
+                # non-ascii, quotes and NULLs have to encode the same on both paths
+                items=[
+                    models.Item(
+                        title=f"Item {n}.{i} \"quoted\" café",
+                        description=None if i % 3 == 0 else "lorem ipsum ☃",
+                    )
+                    for i in range(items_per_user)
+                ],
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def time_pages(client, urls, rounds: int):
+    bodies = [client.get(url).content for url in urls]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url in urls:
+            client.get(url)
+    elapsed = time.perf_counter() - start
+    return bodies, elapsed / (rounds * len(urls)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--items-per-user", type=int, default=5)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.users, args.items_per_user)
+    urls = [
+        f"/users/?limit={args.page}",
+        f"/users/?cursor=&limit={args.page}",
+        f"/items/?limit={args.page}",
+        f"/items/?cursor=&limit={args.page}",
+    ]
+    client = TestClient(app)
+
+    settings.fast_json = False
+    expected, regular_ms = time_pages(client, urls, args.rounds)
+    settings.fast_json = True
+    actual, fast_ms = time_pages(client, urls, args.rounds)
+
+    mismatched = [url for url, a, b in zip(urls, expected, actual) if a != b]
+    if mismatched:
+        raise SystemExit(f"fast path output differs for {mismatched}")
+    report("serialization", {
+        "users": args.users,
+        "items_per_user": args.items_per_user,
+        "page": args.page,
+        "identical_output": True,
+        "response_model_ms_per_page": round(regular_ms, 2),
+        "orjson_ms_per_page": round(fast_ms, 2),
+        "speedup": round(regular_ms / fast_ms, 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
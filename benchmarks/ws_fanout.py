@@ -0,0 +1,144 @@
+"""Broadcast latency of /ws/items at 10k subscribers.
+
+Opens the WebSocket connections in-process against the ASGI app, then
+publishes item_created events from a worker thread, the way the sync routes
+do. Latency is measured from the publish call to each subscriber's send, so
+it covers the hop onto the event loop, the fan-out and the per-connection
+tasks. A share of the connections can be made slow to exercise the
+coalesce / drop policies.
+
+    python -m benchmarks.ws_fanout --connections 10000 --events 20 --slow 100
+"""
+import argparse
+import asyncio
+import time
+
+import orjson
+
+from benchmarks.common import percentiles, report, use_super_project
+
+use_super_project()
+
+from app.broadcast import item_feed  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+class Connection:
+    def __init__(self, number: int, published_at: dict, slow: float):
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": "/ws/items",
+            "raw_path": b"/ws/items",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 10000 + number),
+            "server": ("testserver", 80),
+            "subprotocols": [],
+        }
+        self.published_at = published_at
+        self.slow = slow
+        self.incoming = asyncio.Queue()
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.latencies = []
+        self.overflows = 0
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        if message["type"] == "websocket.send":
+            published = self.published_at.get(message["text"])
+            if published is None:
+                self.overflows += 1
+            else:
+                self.latencies.append(time.perf_counter() - published)
+            if self.slow:
+                await asyncio.sleep(self.slow)
+
+    def run(self):
+        return asyncio.create_task(app(self.scope, self.receive, self.send))
+
+    def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+
+def publish(event: dict, published_at: dict):
+    published_at[orjson.dumps(event).decode()] = time.perf_counter()
+    item_feed.publish(event)
+
+
+async def run(connections: int, events: int, interval: float, slow: int, slow_delay: float) -> dict:
+    published_at = {}
+    clients = [
+        Connection(n, published_at, slow_delay if n < slow else 0.0)
+        for n in range(connections)
+    ]
+    start = time.perf_counter()
+    tasks = [client.run() for client in clients]
+    while item_feed.stats()["subscribers"] < connections:
+        await asyncio.sleep(0.01)
+    connect_s = time.perf_counter() - start
+
+    loop = asyncio.get_running_loop()
+    for n in range(events):
+        event = {"type": "item_created", "item": {"title": f"item {n}", "description": None, "id": n, "owner_id": 1}}
+        await loop.run_in_executor(None, publish, event, published_at)
+        await asyncio.sleep(interval)
+
+    fast = clients[slow:]
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline and any(len(client.latencies) < events for client in fast):
+        await asyncio.sleep(0.01)
+
+    stats = item_feed.stats()
+    for client in clients:
+        client.disconnect()
+    await asyncio.gather(*tasks)
+
+    latencies = [latency for client in fast for latency in client.latencies]
+    slow_clients = clients[:slow]
+    return {
+        "connections": connections,
+        "events": events,
+        "connect_s": round(connect_s, 2),
+        "delivered": len(latencies),
+        "expected": len(fast) * events,
+        "latency_ms": percentiles(latencies),
+        # time until the last fast subscriber had each event
+        "fan_out_ms": percentiles([
+            max(client.latencies[n] for client in fast) for n in range(events)
+            if all(len(client.latencies) > n for client in fast)
+        ]),
+        "slow_consumers": {
+            "connections": slow,
+            "policy": item_feed.policy,
+            "queue_size": item_feed.queue_size,
+            "delivered": sum(len(client.latencies) for client in slow_clients),
+            "overflow_messages": sum(client.overflows for client in slow_clients),
+        },
+        "broadcaster": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.25)
+    parser.add_argument("--slow", type=int, default=100, help="connections that take --slow-delay per message")
+    parser.add_argument("--slow-delay", type=float, default=1.0)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--policy", choices=("coalesce", "drop"), default="coalesce")
+    args = parser.parse_args()
+
+    item_feed.queue_size = args.queue_size
+    item_feed.policy = args.policy
+    report("ws_fanout", asyncio.run(run(
+        args.connections, args.events, args.interval, args.slow, args.slow_delay)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 from datetime import datetime, timedelta
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from passlib.context import CryptContext
@@ -11,6 +19,16 @@ from jose import jwt, JWTError
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# bcrypt workers, a login waits at most HASH_QUEUE_TIMEOUT seconds for a free one
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE_TIMEOUT = float(os.getenv("AUTH_HASH_QUEUE_TIMEOUT", "5"))
+# verified tokens remembered by get_current_user, 0 disables the cache
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# /token attempts refill at RATE per second up to BURST, per username and per client IP, a rate of 0 disables the limit
+LOGIN_RATE_PER_USER = float(os.getenv("AUTH_LOGIN_RATE_PER_USER", "0.2"))
+LOGIN_BURST_PER_USER = int(os.getenv("AUTH_LOGIN_BURST_PER_USER", "5"))
+LOGIN_RATE_PER_IP = float(os.getenv("AUTH_LOGIN_RATE_PER_IP", "1"))
+LOGIN_BURST_PER_IP = int(os.getenv("AUTH_LOGIN_BURST_PER_IP", "20"))
 
 fake_users_db = {
     "johndoe": {
@@ -56,6 +74,58 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+# A bcrypt check takes ~200ms of CPU, run inline it would block the event loop
+# and every other request with it. bcrypt releases the GIL while hashing, so
+# a thread pool is enough to run the checks in parallel off the loop.
+@app.on_event("startup")
+def start_hash_executor():
+    # built per lifespan, a shut down executor or a semaphore bound to an
+    # old event loop cannot be reused by the next one
+    app.state.hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    app.state.hash_slots = asyncio.Semaphore(HASH_WORKERS)
+    app.state.hash_loop = asyncio.get_running_loop()
+
+
+@app.on_event("shutdown")
+def shutdown_hash_executor():
+    app.state.hash_executor.shutdown(wait=False)
+    app.state.hash_executor = None
+
+
+def hash_pool():
+    """The bcrypt executor and the semaphore of the running loop.
+
+    Without a startup event (eg. a TestClient used without `with`, which
+    runs every request on a new loop) they are created on first use, the
+    executor then lives as long as the process.
+    """
+    state = app.state
+    loop = asyncio.get_running_loop()
+    if getattr(state, "hash_executor", None) is None:
+        state.hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    if getattr(state, "hash_loop", None) is not loop:
+        state.hash_slots = asyncio.Semaphore(HASH_WORKERS)
+        state.hash_loop = loop
+    return state.hash_executor, state.hash_slots
+
+
+async def run_hashing(func, *args):
+    """Run a hashing call on the bcrypt pool, bounded to HASH_WORKERS at a time"""
+    hash_executor, hash_slots = hash_pool()
+    try:
+        await asyncio.wait_for(hash_slots.acquire(), HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, func, *args)
+    finally:
+        hash_slots.release()
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -66,16 +136,85 @@ def get_user(db, username: str):
     return None
 
 
-def authenticate_user(fake_db, username: str, password: str):
+async def authenticate_user(fake_db, username: str, password: str):
     user = get_user(fake_db, username)
     print(user)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await run_hashing(verify_password, password, user.hashed_password):
         return False
     return user
 
 
+class BucketStore(ABC):
+    """Token buckets for the login throttle. The in-memory store limits a
+    single process, a shared implementation (eg. Redis with a Lua script)
+    only has to provide `take` to limit across workers.
+    """
+
+    @abstractmethod
+    def take(self, limits) -> float:
+        """Take one token from each (key, rate, burst) bucket of `limits`, or from none.
+
+        Return 0 when every bucket had a token, otherwise nothing is consumed
+        and the seconds until they all have one are returned. Checking and
+        taking must be atomic, a rejected attempt must not drain the buckets
+        that still had tokens.
+        """
+
+
+class MemoryBucketStore(BucketStore):
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    def take(self, limits) -> float:
+        now = time.monotonic()
+        refilled = []
+        wait = 0.0
+        for key, rate, burst in limits:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            refilled.append((key, tokens))
+        for key, tokens in refilled:
+            self._buckets[key] = (tokens if wait else tokens - 1, now)
+        # attackers control the keys, forget the least recently seen ones
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class LoginThrottle:
+    def __init__(self, store: BucketStore):
+        self.store = store
+        self.rejected = 0
+
+    def check(self, username: str, client_ip: str):
+        """Raise 429 when either bucket is empty, this runs before any bcrypt work.
+
+        A token is only taken when both buckets allow the attempt, so
+        attempts refused by the per-IP limit do not lock the user out.
+        """
+        limits = []
+        if LOGIN_RATE_PER_USER:
+            limits.append((f"user:{username}", LOGIN_RATE_PER_USER, LOGIN_BURST_PER_USER))
+        if LOGIN_RATE_PER_IP:
+            limits.append((f"ip:{client_ip}", LOGIN_RATE_PER_IP, LOGIN_BURST_PER_IP))
+        wait = self.store.take(limits) if limits else 0.0
+        if wait:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+login_throttle = LoginThrottle(MemoryBucketStore())
+
+
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -87,8 +226,92 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     return encoded_jwt
 
 
+class TokenCache:
+    """Users resolved from already verified bearer tokens.
+
+    Entries are keyed by a digest of the token (the token itself is never
+    stored) and live until the token's `exp`. Everything runs on the event
+    loop, so no locking is needed.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._by_username = {}
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.decode_seconds = 0.0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is not None:
+            expires, user = entry
+            if expires > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return user
+            self._drop(digest)
+        self.misses += 1
+        return None
+
+    def put(self, token: str, expires, user, decode_seconds: float):
+        self.decodes += 1
+        self.decode_seconds += decode_seconds
+        # a token without an expiry is valid forever, do not pin it in memory
+        if not self.maxsize or expires is None:
+            return
+        digest = self._digest(token)
+        self._entries[digest] = (expires, user)
+        self._by_username.setdefault(user.username, set()).add(digest)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, digest: bytes):
+        _, user = self._entries.pop(digest)
+        digests = self._by_username.get(user.username)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_username[user.username]
+
+    def invalidate_user(self, username: str):
+        """Forget every token of `username`, eg. after the account is disabled"""
+        for digest in list(self._by_username.get(username, ())):
+            self._drop(digest)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        average_decode = self.decode_seconds / self.decodes if self.decodes else 0.0
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "average_decode_ms": round(average_decode * 1000, 4),
+            "decode_time_saved_ms": round(self.hits * average_decode * 1000, 3),
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def disable_user(username: str):
+    fake_users_db[username]["disabled"] = True
+    token_cache.invalidate_user(username)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     print(token,  'token')
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    started = time.perf_counter()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -107,6 +330,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     print(user)
     if user is None:
         raise credentials_exception
+    token_cache.put(token, payload.get("exp"), user, time.perf_counter() - started)
     return user
 
 
@@ -117,8 +341,9 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 
 
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    login_throttle.check(form_data.username, request.client.host if request.client else "unknown")
+    user = await authenticate_user(
         fake_users_db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -142,3 +367,8 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 @app.get("/users/me/items/")
 async def read_own_items(current_user: User = Depends(get_current_active_user)):
     return [{"item_id": "Foo", "owner": current_user.username}]
+
+
+@app.get("/metrics/token-cache")
+async def read_token_cache_stats():
+    return token_cache.stats()
@@ -1,15 +1,148 @@
-from fastapi import BackgroundTasks, FastAPI
+import os
+import queue
+import threading
+import time
+
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from jobs import JobQueue, task
+
+NOTIFICATION_LOG = os.getenv("NOTIFICATION_LOG", "log.txt")
+# events waiting to be written, new ones are dropped (and counted) once it is full
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "10000"))
+# buffered lines are flushed once they reach this size or this age
+NOTIFICATION_FLUSH_BYTES = int(os.getenv("NOTIFICATION_FLUSH_BYTES", str(64 * 1024)))
+NOTIFICATION_FLUSH_SECONDS = float(os.getenv("NOTIFICATION_FLUSH_SECONDS", "1.0"))
+# "writer" logs from this process, "jobs" enqueues into the durable queue run by `python jobs.py worker`
+NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "writer")
 
 app = FastAPI()
 
+_STOP = object()
+
+
+class NotificationWriter:
+    """Append-only log writer.
+
+    The file is opened once and drained by a single worker thread which
+    batches queued lines into one write, instead of an open/write/close per
+    notification.
+    """
+
+    def __init__(self, path: str, max_queue: int, flush_bytes: int, flush_interval: float):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write out everything queued so far, then stop the worker"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, line: str) -> bool:
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        with open(self.path, mode="a") as log_file:
+            buffer = []
+            buffered = 0
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    line = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    line = None
+                if line is _STOP:
+                    break
+                if line is not None:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    buffer.append(line)
+                    buffered += len(line)
+                    if buffered < self.flush_bytes and time.monotonic() < deadline:
+                        continue
+                if buffer:
+                    self._flush(log_file, buffer)
+                buffer, buffered, deadline = [], 0, None
+            if buffer:
+                self._flush(log_file, buffer)
+
+    def _flush(self, log_file, buffer):
+        log_file.write("".join(buffer))
+        log_file.flush()
+        self.written += len(buffer)
+        self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+        }
+
+
+notification_writer = NotificationWriter(
+    NOTIFICATION_LOG, NOTIFICATION_QUEUE_SIZE, NOTIFICATION_FLUSH_BYTES, NOTIFICATION_FLUSH_SECONDS
+)
+app.on_event("startup")(notification_writer.start)
+app.on_event("shutdown")(notification_writer.stop)
+
 
 def write_notification(email: str, message=""):
-    with open("log.txt", mode="w") as email_file:
-        content = f"notification for {email}: {message}"
-        email_file.write(content)
+    content = f"notification for {email}: {message}\n"
+    notification_writer.submit(content)
+
+
+job_queue = JobQueue()
+
+
+@task
+def send_notification_job(email: str, message: str = ""):
+    """Job version of write_notification, runs in a worker process"""
+    with open(NOTIFICATION_LOG, mode="a") as email_file:
+        email_file.write(f"notification for {email}: {message}\n")
 
 
 @app.post("/send-notification/{email}")
-async def send_notification(email: str, background_tasks: BackgroundTasks):
-    background_tasks.add_task(write_notification, email, message="some notification")
-    return {"message": "Notification sent in the background"}
\ No newline at end of file
+async def send_notification(email: str):
+    if NOTIFICATION_BACKEND == "jobs":
+        job_id = await run_in_threadpool(
+            job_queue.enqueue, "send_notification_job", {"email": email, "message": "some notification"}
+        )
+        return {"message": "Notification queued", "job_id": job_id}
+    # queueing the line is cheap enough to do inline, the writer thread does the I/O
+    write_notification(email, message="some notification")
+    return {"message": "Notification sent in the background"}
+
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: int):
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/notifications/stats")
+async def notification_stats():
+    return notification_writer.stats()
@@ -1,5 +1,13 @@
+import os
+import re
+from collections import OrderedDict
+
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+
+ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+SAFELISTED_HEADERS = {"accept", "accept-language", "content-language", "content-type"}
+# how long browsers may reuse a preflight answer before asking again
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "600"))
 
 app = FastAPI()
 
@@ -10,12 +18,154 @@ origins = [
     "http://localhost:8080",
 ]
 
+
+class CachedCORSMiddleware:
+    """CORS with the work done up front.
+
+    Allowed origins are compiled once into a set plus an optional regex,
+    and preflight answers are built once per (origin, method, headers)
+    and replayed from a bounded cache, so an OPTIONS request never reaches
+    the routing layer. Same options as starlette's CORSMiddleware.
+    """
+
+    def __init__(
+        self,
+        app,
+        allow_origins=(),
+        allow_origin_regex: str = None,
+        allow_methods=("GET",),
+        allow_headers=(),
+        allow_credentials: bool = False,
+        expose_headers=(),
+        max_age: int = 600,
+        cache_size: int = 1024,
+    ):
+        self.app = app
+        self.allow_all_origins = "*" in allow_origins
+        self.allow_origins = frozenset(origin for origin in allow_origins if origin != "*")
+        self.allow_origin_regex = re.compile(allow_origin_regex) if allow_origin_regex else None
+        self.allow_methods = frozenset(ALL_METHODS if "*" in allow_methods else allow_methods)
+        self.allow_all_headers = "*" in allow_headers
+        self.allow_headers = frozenset(h.lower() for h in allow_headers) | SAFELISTED_HEADERS
+        self.allow_credentials = allow_credentials
+        self.cache_size = cache_size
+        self._preflights = OrderedDict()
+        self._simple_headers = OrderedDict()
+
+        # the parts of the answers that do not depend on the request
+        self._preflight_common = [
+            (b"access-control-allow-methods", ", ".join(sorted(self.allow_methods)).encode()),
+            (b"access-control-max-age", str(max_age).encode()),
+            (b"vary", b"Origin"),
+        ]
+        self._simple_common = []
+        if allow_credentials:
+            self._preflight_common.append((b"access-control-allow-credentials", b"true"))
+            self._simple_common.append((b"access-control-allow-credentials", b"true"))
+        if expose_headers:
+            self._simple_common.append((b"access-control-expose-headers", ", ".join(expose_headers).encode()))
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins or origin in self.allow_origins:
+            return True
+        return self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin) is not None
+
+    def _allow_origin_value(self, origin: str) -> bytes:
+        # "*" is not accepted by browsers on credentialed requests, echo the origin instead
+        if self.allow_all_origins and not self.allow_credentials:
+            return b"*"
+        return origin.encode()
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def _preflight(self, origin: str, method: str, requested_headers: str):
+        key = (origin, method, requested_headers)
+        answer = self._preflights.get(key)
+        if answer is not None:
+            return answer
+
+        failures = []
+        if not self.is_allowed_origin(origin):
+            failures.append("origin")
+        if method not in self.allow_methods:
+            failures.append("method")
+        requested = [h.strip().lower() for h in requested_headers.split(",") if h.strip()]
+        if not self.allow_all_headers and any(h not in self.allow_headers for h in requested):
+            failures.append("headers")
+
+        headers = list(self._preflight_common)
+        if failures:
+            body = f"Disallowed CORS {', '.join(failures)}".encode()
+            headers += [(b"content-type", b"text/plain; charset=utf-8")]
+            answer = (400, headers + [(b"content-length", str(len(body)).encode())], body)
+        else:
+            headers.append((b"access-control-allow-origin", self._allow_origin_value(origin)))
+            if requested_headers:
+                allowed = requested_headers if self.allow_all_headers else ", ".join(sorted(self.allow_headers))
+                headers.append((b"access-control-allow-headers", allowed.encode()))
+            answer = (200, headers + [(b"content-length", b"2")], b"OK")
+        return self._remember(self._preflights, key, answer)
+
+    def _cors_headers(self, origin: str):
+        headers = self._simple_headers.get(origin)
+        if headers is None:
+            headers = []
+            if self.is_allowed_origin(origin):
+                headers = [(b"access-control-allow-origin", self._allow_origin_value(origin))]
+                headers += self._simple_common
+                if not (self.allow_all_origins and not self.allow_credentials):
+                    headers.append((b"vary", b"Origin"))
+            self._remember(self._simple_headers, origin, headers)
+        return headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = request_method = None
+        requested_headers = ""
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value.decode("latin-1")
+            elif name == b"access-control-request-method":
+                request_method = value.decode("latin-1")
+            elif name == b"access-control-request-headers":
+                requested_headers = value.decode("latin-1")
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            status, headers, body = self._preflight(origin, request_method, requested_headers)
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        cors_headers = self._cors_headers(origin)
+        if not cors_headers:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *cors_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[origins],
+    CachedCORSMiddleware,
+    allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=CORS_MAX_AGE,
 )
 
 
@@ -0,0 +1,278 @@
+"""Per-route timing of Depends resolution.
+
+With PROFILE_DEPENDENCIES=1 every dependency callable of the app is swapped
+for a wrapper that times the call itself (its own sub-dependencies are timed
+on their own). Coroutine and generator wrappers have the same kind as the
+original, so FastAPI still awaits them, or pushes a generator to the
+threadpool. A plain sync dependency gets a coroutine wrapper that does the
+run_in_threadpool FastAPI would do, so the wait for a worker thread is
+measured next to the call. Results are still memoized per request.
+
+For each route the report lists, per dependency:
+
+- calls, mean and max time of the calls,
+- threadpool: the dependency is sync and ran on a worker thread,
+- threadpool_wait_ms: for plain sync functions, the mean time from the call
+  on the event loop until a worker thread started it, the cost of the
+  dispatch (sync generators are entered by FastAPI itself, not measured),
+- reused: times the dependency appears in the route's tree but its result
+  came from the per-request cache,
+- recomputed: extra calls within one request, from Depends(use_cache=False).
+
+Reuse is only counted for requests answered below 400, a failing dependency
+stops the resolution and the ones after it never run.
+
+The report is served at GET /debug/dependencies. Swapping the callables
+means app.dependency_overrides no longer match profiled dependencies, so
+this is meant for a running server, not for tests.
+"""
+import contextvars
+import functools
+import os
+import time
+from collections import Counter
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import is_async_gen_callable, is_coroutine_callable, is_gen_callable
+from fastapi.routing import APIRoute
+
+PROFILE_DEPENDENCIES = os.getenv("PROFILE_DEPENDENCIES", "0") == "1"
+
+# calls recorded for the request being served, shared with the threadpool
+# through the copied context
+current_calls = contextvars.ContextVar("current_calls", default=None)
+
+
+def dependency_name(call) -> str:
+    return getattr(call, "__qualname__", None) or type(call).__qualname__
+
+
+def _record(original, start: int, end: int = None, wait: int = 0):
+    calls = current_calls.get()
+    if calls is not None:
+        calls.append((original, (end or time.perf_counter_ns()) - start, wait))
+
+
+def timed(original):
+    """Wrapper with the same calling convention as `original`"""
+    if is_gen_callable(original):
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            gen = original(*args, **kwargs)
+            try:
+                value = next(gen)
+            finally:
+                _record(original, start)
+            # FastAPI drives it as a context manager, a single yield
+            try:
+                yield value
+            except BaseException as exc:
+                try:
+                    gen.throw(exc)
+                except StopIteration:
+                    return
+                raise RuntimeError("generator didn't stop after throw()")
+            else:
+                next(gen, None)
+    elif is_async_gen_callable(original):
+        @functools.wraps(original)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            gen = original(*args, **kwargs)
+            try:
+                value = await gen.__anext__()
+            finally:
+                _record(original, start)
+            try:
+                yield value
+            except BaseException as exc:
+                try:
+                    await gen.athrow(exc)
+                except StopAsyncIteration:
+                    return
+                raise RuntimeError("generator didn't stop after athrow()")
+            else:
+                async for _ in gen:
+                    pass
+    elif is_coroutine_callable(original):
+        @functools.wraps(original)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                _record(original, start)
+    else:
+        async def wrapper(*args, **kwargs):
+            # timed from the event loop, the hop to a worker thread is the
+            # cost that matters for a sync dependency
+            queued = time.perf_counter_ns()
+            started = []
+
+            def call():
+                started.append(time.perf_counter_ns())
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    started.append(time.perf_counter_ns())
+
+            try:
+                return await run_in_threadpool(call)
+            finally:
+                if started:
+                    _record(original, started[0], started[-1], started[0] - queued)
+        functools.update_wrapper(wrapper, original, updated=())
+    wrapper.profiled_call = original
+    return wrapper
+
+
+class DependencyStats:
+    __slots__ = ("calls", "total_ns", "max_ns", "wait_ns", "threadpool", "reused", "recomputed")
+
+    def __init__(self, threadpool: bool):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.wait_ns = 0
+        self.threadpool = threadpool
+        self.reused = 0
+        self.recomputed = 0
+
+    def to_dict(self, name: str) -> dict:
+        return {
+            "dependency": name,
+            "calls": self.calls,
+            "mean_ms": round(self.total_ns / self.calls / 1e6, 4) if self.calls else 0.0,
+            "max_ms": round(self.max_ns / 1e6, 4),
+            "threadpool_wait_ms": round(self.wait_ns / self.calls / 1e6, 4) if self.calls else 0.0,
+            "threadpool": self.threadpool,
+            "reused": self.reused,
+            "recomputed": self.recomputed,
+        }
+
+
+class RouteDependencies:
+    """The static dependency tree of a route and what its requests did with it"""
+
+    def __init__(self, dependant: Dependant):
+        # original call -> (cached occurrences, uncached occurrences)
+        self.occurrences = {}
+        self.requests = 0
+        self.stats = {}
+        self._walk(dependant)
+
+    def _walk(self, dependant: Dependant):
+        for sub in dependant.dependencies:
+            self._walk(sub)
+            original = getattr(sub.call, "profiled_call", sub.call)
+            cached, uncached = self.occurrences.get(original, (0, 0))
+            if sub.use_cache:
+                cached += 1
+            else:
+                uncached += 1
+            self.occurrences[original] = (cached, uncached)
+            if original not in self.stats:
+                sync = not (is_coroutine_callable(original) or is_async_gen_callable(original))
+                self.stats[original] = DependencyStats(threadpool=sync)
+
+    def add_request(self, calls: list, completed: bool):
+        """`completed` is False when the request failed, dependencies after
+        the failing one never ran and must not count as reused
+        """
+        self.requests += 1
+        per_call = Counter()
+        for original, elapsed, wait in calls:
+            stats = self.stats.get(original)
+            if stats is None:
+                continue
+            per_call[original] += 1
+            stats.calls += 1
+            stats.total_ns += elapsed
+            stats.wait_ns += wait
+            stats.max_ns = max(stats.max_ns, elapsed)
+        if not completed:
+            return
+        for original, (cached, uncached) in self.occurrences.items():
+            ran = per_call[original]
+            # uncached nodes always run, the cached ones at most once between them
+            ran_cached = ran - uncached
+            stats = self.stats[original]
+            if cached:
+                stats.reused += max(0, cached - max(ran_cached, 0))
+            stats.recomputed += max(0, ran - 1)
+
+    def report(self) -> dict:
+        return {
+            "requests": self.requests,
+            "dependencies": [
+                stats.to_dict(dependency_name(original)) for original, stats in self.stats.items()
+            ],
+        }
+
+
+class DependencyProfiler:
+    def __init__(self):
+        self.routes = {}
+        self._wrappers = {}
+
+    def install(self, app):
+        """Profile the routes registered so far, call it after the last include_router"""
+        for route in app.routes:
+            if isinstance(route, APIRoute) and not hasattr(route.app, "profiled_route"):
+                self._install_route(route)
+
+    def _wrap(self, dependant: Dependant):
+        for sub in dependant.dependencies:
+            self._wrap(sub)
+            if sub.call is None or hasattr(sub.call, "profiled_call"):
+                continue
+            # one wrapper per callable, so the per-request cache still matches across nodes
+            wrapper = self._wrappers.get(sub.call)
+            if wrapper is None:
+                wrapper = self._wrappers[sub.call] = timed(sub.call)
+            sub.call = wrapper
+            sub.cache_key = (wrapper, sub.cache_key[1])
+
+    def _install_route(self, route: APIRoute):
+        key = f"{','.join(sorted(route.methods))} {route.path}"
+        route_dependencies = RouteDependencies(route.dependant)
+        if not route_dependencies.occurrences:
+            return
+        self._wrap(route.dependant)
+        self.routes[key] = route_dependencies
+        handle = route.app
+
+        async def app(scope, receive, send):
+            calls = []
+            status = []
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                await send(message)
+
+            token = current_calls.set(calls)
+            try:
+                await handle(scope, receive, send_wrapper)
+            finally:
+                current_calls.reset(token)
+                route_dependencies.add_request(calls, completed=bool(status) and status[0] < 400)
+
+        app.profiled_route = True
+        route.app = app
+
+    def report(self) -> dict:
+        return {key: route.report() for key, route in self.routes.items() if route.requests}
+
+
+dependency_profiler = DependencyProfiler()
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/dependencies")
+async def read_dependency_profile():
+    return dependency_profiler.report()
@@ -0,0 +1,240 @@
+"""Durable job queue backed by SQLite with a pool of worker processes.
+
+Jobs survive restarts and run outside the web workers. Register a function
+with @task, enqueue it by name from the app and start the workers with:
+
+    python jobs.py worker --tasks background_task --concurrency 4
+
+Failed jobs are retried with exponential backoff up to JOB_MAX_ATTEMPTS.
+A job still marked running after JOB_LEASE_SECONDS (its worker died) is
+picked up again, or marked failed when that was its last attempt.
+
+Delivery is at least once: a worker that dies after the work but before
+recording it, or a job running longer than JOB_LEASE_SECONDS, means the
+job runs again. Tasks must be idempotent. Only the worker holding the
+current claim records the outcome, a worker whose lease expired has its
+result dropped.
+"""
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+import traceback
+
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "2"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "300"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+logger = logging.getLogger("jobs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    locked_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+tasks = {}
+
+
+def task(func):
+    """Register `func` so workers can run jobs enqueued under its name"""
+    tasks[func.__name__] = func
+    return func
+
+
+def backoff(attempts: int) -> float:
+    return min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # sqlite connections can not be shared between threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, name: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO jobs (name, payload, max_attempts, run_after, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (name, json.dumps(payload), max_attempts, now, now, now),
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id: int):
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def claim(self):
+        """Lock the next due job for this worker, None when there is nothing to do"""
+        now = time.time()
+        db = self.db
+        # IMMEDIATE takes the write lock up front so two workers can not claim the same row
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # a job whose worker died on every attempt (eg. it crashes or OOMs the
+            # process) is given up on, otherwise it would be picked up forever
+            db.execute(
+                "UPDATE jobs SET status = 'failed', locked_until = NULL,"
+                " last_error = 'lease expired on the last attempt, the worker died', updated_at = ?"
+                " WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = db.execute(
+                "SELECT * FROM jobs"
+                " WHERE (status = 'queued' AND run_after <= ?)"
+                " OR (status = 'running' AND locked_until < ? AND attempts < max_attempts)"
+                " ORDER BY run_after, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                    " locked_until = ?, updated_at = ? WHERE id = ?",
+                    (now + JOB_LEASE_SECONDS, now, row["id"]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def complete(self, job: dict) -> bool:
+        """Mark the claimed `job` done, False when its lease was lost to another worker"""
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = 'done', locked_until = NULL, last_error = NULL, updated_at = ?"
+            " WHERE id = ? AND status = 'running' AND attempts = ?",
+            (time.time(), job["id"], job["attempts"]),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: dict, error: str) -> bool:
+        """Queue the claimed `job` for a retry or give up on it, False when its lease was lost"""
+        now = time.time()
+        if job["attempts"] >= job["max_attempts"]:
+            status, run_after = "failed", job["run_after"]
+        else:
+            status, run_after = "queued", now + backoff(job["attempts"])
+        # only the worker holding the current claim may record the outcome, a worker
+        # whose lease expired must not finish or re-queue the attempt another one runs
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = ?, run_after = ?, locked_until = NULL, last_error = ?,"
+            " updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (status, run_after, error, now, job["id"], job["attempts"]),
+        )
+        return cursor.rowcount == 1
+
+
+def work(path: str, modules: list, poll_interval: float):
+    """Worker process body: claim, run, record the outcome, repeat until SIGTERM"""
+    for module in modules:
+        importlib.import_module(module)
+    queue = JobQueue(path)
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while not stopping:
+        job = queue.claim()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        func = tasks.get(job["name"])
+        try:
+            if func is None:
+                raise LookupError(f"no task registered as {job['name']!r}")
+            func(**job["payload"])
+        except Exception:
+            logger.exception("job %s (%s) failed", job["id"], job["name"])
+            recorded = queue.fail(job, traceback.format_exc(limit=5))
+        else:
+            recorded = queue.complete(job)
+        if not recorded:
+            logger.warning(
+                "job %s (%s) ran past its lease and was claimed again, outcome of attempt %s dropped",
+                job["id"], job["name"], job["attempts"],
+            )
+
+
+def run_workers(path: str, modules: list, concurrency: int, poll_interval: float):
+    processes = [
+        multiprocessing.Process(target=work, args=(path, modules, poll_interval), name=f"job-worker-{n}")
+        for n in range(concurrency)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        # pass the signal on, each worker finishes its current job and exits
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    worker = subcommands.add_parser("worker", help="run a pool of worker processes")
+    worker.add_argument("--tasks", action="append", required=True, help="module registering @task functions")
+    worker.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    worker.add_argument("--poll-interval", type=float, default=0.5)
+    worker.add_argument("--db", default=JOBS_DB)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_workers(args.db, args.tasks, args.concurrency, args.poll_interval)
+
+
+if __name__ == "__main__":
+    # go through the importable module, the @task registrations made by the
+    # --tasks modules land in jobs.tasks, not in this __main__ copy
+    import jobs
+
+    jobs.main()
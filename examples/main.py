@@ -1,3 +1,6 @@
+import hashlib
+import os
+import tempfile
 from datetime import datetime
 
 from fastapi import (
@@ -12,14 +15,25 @@ from fastapi import (
     File,
     UploadFile,
     HTTPException,
-    Depends
+    Depends,
+    Request,
+    Response
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from enum import Enum
 from typing import Union, Set, List
 from pydantic import BaseModel, Field,  EmailStr
 
+from dependency_profiler import PROFILE_DEPENDENCIES, dependency_profiler, router as dependency_router
+from patching import diff_patch, diff_validated
+from repository import ItemRepository
+from response_cache import CachedRoute, cached, response_cache
+from profiling import ProfilingMiddleware, profile_store, router as profiling_router
+
 app = FastAPI()
+# GET routes marked with @cached replay their encoded response, see response_cache
+app.router.route_class = CachedRoute
 
 # basic path
 
@@ -47,6 +61,7 @@ class ModelName(str, Enum):
 
 
 @app.get("/models/{model_name}")
+@cached("models")
 async def get_model(model_name: ModelName):
     '''predefined parameter'''
     if model_name is ModelName.alexnet:
@@ -69,6 +84,8 @@ async def read_file(file_path: str):
 
 # QUERY PARAMETER
 
+# not an ItemRepository: a list slice already costs O(limit) and the
+# records are not Item-shaped (no price or tags to index)
 fake_items_db = [{"item_name": "Foo"}, {
     "item_name": "Bar"}, {"item_name": "Baz"}]
 
@@ -211,6 +228,7 @@ async def single_item(item: Item) -> Item:
 
 
 @app.get("/list_items/", response_model=List[Item])
+@cached("list_items")
 def list_items():
     return [
         {"name": "Portal Gun", "price": 42.0},
@@ -255,16 +273,20 @@ def create_user(user: UserIn):
     return user
 
 
-products = {
+products = ItemRepository.from_dict({
     "foo": {"name": "Foo", "price": 50.2},
     "bar": {"name": "Bar", "description": "The bartenders", "price": 62, "tax": 20.2},
     "baz": {"name": "Baz", "description": None, "price": 50.2, "tax": 10.5, "tags": []},
-}
+})
 
 
 @app.get("/get_item/{item_id}", response_model=Item, response_model_exclude_unset=True, response_model_exclude_defaults=False, response_model_exclude_none=False, response_model_include={"name"},)
+@cached("products")
 def get_item(item_id: str):
-    return products[item_id]
+    record = products.get(item_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return record.to_dict()
 
 
 # LIST OF MODELS
@@ -281,6 +303,7 @@ objects = [
 
 
 @app.get("/get_description/", response_model=List[Description], status_code=status.HTTP_201_CREATED)
+@cached("descriptions")
 async def read_items():
     return objects
 
@@ -300,6 +323,7 @@ def login(username: str = Form(), password: str = Form(), age: str = Form()):
 
 @app.post("/files/")
 async def create_file(file: Union[bytes, None] = File(default=None)):
+    '''The whole file is read into memory, use /stream_upload/ for large files'''
     if not file:
         return {"message": "No file sent"}
     else:
@@ -311,11 +335,72 @@ async def create_upload_file(file: Union[UploadFile, None] = None):
     if not file:
         return {"message": "No upload file sent"}
     else:
-        return {"filename": file.filename}
+        # UploadFile spools to disk, read it back in chunks to keep memory flat
+        digest = hashlib.sha256()
+        size = 0
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+        return {"filename": file.filename, "size": size, "sha256": digest.hexdigest()}
+
+
+# STREAMING UPLOAD
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 ** 3)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def write_chunk(out, digest, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+
+@app.post("/stream_upload/{filename}", status_code=status.HTTP_201_CREATED)
+async def stream_upload(filename: str, request: Request):
+    '''The raw request body is hashed and written to UPLOAD_DIR chunk by chunk as it
+    arrives, memory use does not depend on the upload size. A stored file is never
+    replaced, uploading a name that is already taken answers 409
+    '''
+    name = os.path.basename(filename)
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+
+    target = os.path.join(UPLOAD_DIR, name)
+    # fail before reading the body when the name is known to be taken
+    if os.path.exists(target):
+        raise HTTPException(status_code=409, detail="File already exists")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # write to a temporary file first so a failed upload never leaves a partial file under the name
+    fd, partial_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                # hashing and the disk write release the GIL, keep both off the event loop
+                await run_in_threadpool(write_chunk, out, digest, chunk)
+        try:
+            # unlike os.replace, link fails when the name exists, so a concurrent
+            # upload of the same name that finished first is kept
+            os.link(partial_path, target)
+        except FileExistsError:
+            raise HTTPException(status_code=409, detail="File already exists")
+    finally:
+        os.remove(partial_path)
+    return {"filename": name, "size": size, "sha256": digest.hexdigest()}
 
 
 # EXCEPTION HANDLING
 
+# only looked up by key, the dict already is the index
 store_items = {"foo": "The Foo Wrestlers"}
 
 
@@ -348,6 +433,7 @@ class JsonItem(BaseModel):
     description: Union[str, None] = None
 
 
+# JsonItem records written by key and never queried by tag or price, a dict is enough
 fake_db = {}
 
 
@@ -359,32 +445,82 @@ def json_items(id: str, item: JsonItem):
     print(json_compatible_item_data)
     fake_db[id] = json_compatible_item_data
 
-    return fake_db
+    # only the record that changed, the whole store grows with every PUT
+    return {id: json_compatible_item_data}
 
 
 # BODY UPDATE
 
-items = {
+items = ItemRepository.from_dict({
     "foo": {"name": "Foo", "price": 50.2},
     "bar": {"name": "Bar", "description": "The bartenders", "price": 62, "tax": 20.2},
     "baz": {"name": "Baz", "description": None, "price": 50.2, "tax": 10.5, "tags": []},
-}
+})
+
+
+def get_stored_item(item_id: str):
+    record = items.get(item_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return record
 
 
 @app.get("/get_json_item/{item_id}", response_model=Item)
+@cached("items")
 async def get_json_item(item_id: str):
-    return items[item_id]
+    return get_stored_item(item_id).to_dict()
 
 
 @app.put("/get_json_item/{item_id}", response_model=Item)
-async def update_item(item_id: str, item: Item):
-    saved_data = items[item_id]
-    stored_model = Item(**saved_data)
-    data_to_save_for_update = item.dict(exclude_unset=True)
-    update_data = stored_model.copy(update=data_to_save_for_update)
-    update_item_encoded = jsonable_encoder(update_data)
-    items[item_id] = update_item_encoded
-    return update_item_encoded
+async def update_item(item_id: str, item: Item, response: Response):
+    """Only the fields sent are compared and written back, see patching"""
+    record = get_stored_item(item_id)
+    # FastAPI has validated the body already, only encode and compare the fields sent
+    changes = diff_validated(item, record.to_dict())
+    return save_item_changes(record, changes, response)
+
+
+@app.patch("/get_json_item/{item_id}", response_model=Item)
+async def patch_item(
+    item_id: str,
+    response: Response,
+    patch: dict = Body(media_type="application/merge-patch+json"),
+):
+    """JSON Merge Patch, null resets a field to its default"""
+    record = get_stored_item(item_id)
+    changes = diff_patch(Item, record.to_dict(), patch)
+    return save_item_changes(record, changes, response)
+
+
+def save_item_changes(record, changes: dict, response: Response):
+    response.headers["X-Changed-Fields"] = ",".join(changes)
+    if changes:
+        items.update(record.id, changes)
+        response_cache.invalidate("items")
+    return record.to_dict()
+
+
+@app.get("/metrics/response-cache")
+async def read_response_cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/indexed_items/")
+async def query_items(
+    skip: int = 0,
+    limit: int = Query(default=10, le=1000),
+    tag: Union[str, None] = None,
+    min_price: Union[float, None] = None,
+    max_price: Union[float, None] = None,
+):
+    """Served from the repository indexes: a tag or a price range, otherwise insertion order"""
+    if tag is not None:
+        records = items.with_tag(tag, skip=skip, limit=limit)
+    elif min_price is not None or max_price is not None:
+        records = items.price_between(min_price, max_price, skip=skip, limit=limit)
+    else:
+        records = items.list(skip=skip, limit=limit)
+    return [{"id": record.id, **record.to_dict()} for record in records]
 
 
 # FUNCTION  DEPENDENCY INJECTION
@@ -471,3 +607,13 @@ async def read_items():
     return [{"item": "Foo"}, {"item": "Bar"}]
 
 
+# PROFILING (see profiling.py, send X-Profile: <PROFILE_TOKEN> to profile a request)
+
+app.add_middleware(ProfilingMiddleware, store=profile_store)
+app.include_router(profiling_router)
+
+# DEPENDENCY PROFILING (see dependency_profiler.py, PROFILE_DEPENDENCIES=1), keep it last
+
+if PROFILE_DEPENDENCIES:
+    app.include_router(dependency_router)
+    dependency_profiler.install(app)
@@ -1,19 +1,135 @@
+import os
 import time
+from bisect import bisect_left
 
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROCESS_TIME_HEADER = os.getenv("PROCESS_TIME_HEADER", "1") == "1"
 
 app = FastAPI()
 
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    print(start_time)
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    print(process_time)
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+class Histogram:
+    __slots__ = ("counts", "total_ns")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total_ns = 0
+
+
+class LatencyMetrics:
+    """Latency histograms per route, method and status code.
+
+    Histograms are stored in nested dicts (route -> method -> status) so
+    recording a request is a few lookups and increments, nothing is
+    allocated once a combination has been seen.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._bounds_ns = [int(bound * 1e9) for bound in buckets]
+        self._histograms = {}
+
+    def observe(self, route: str, method: str, status: int, elapsed_ns: int):
+        by_method = self._histograms.get(route)
+        if by_method is None:
+            by_method = self._histograms[route] = {}
+        by_status = by_method.get(method)
+        if by_status is None:
+            by_status = by_method[method] = {}
+        histogram = by_status.get(status)
+        if histogram is None:
+            # the last slot counts requests slower than the largest bucket
+            histogram = by_status[status] = Histogram(len(self._bounds_ns) + 1)
+        histogram.counts[bisect_left(self._bounds_ns, elapsed_ns)] += 1
+        histogram.total_ns += elapsed_ns
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        name = "http_request_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent handling HTTP requests.",
+            f"# TYPE {name} histogram",
+        ]
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for route, by_method in sorted(self._histograms.items()):
+            for method, by_status in sorted(by_method.items()):
+                for status, histogram in sorted(by_status.items()):
+                    labels = f'route="{route}",method="{method}",status="{status}"'
+                    cumulative = 0
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total_ns / 1e9}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class LatencyMetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request with perf_counter_ns.
+
+    Unlike @app.middleware("http") it does not wrap the response in a
+    streaming response and an extra task, it only watches the messages go by.
+    """
+
+    def __init__(self, app, metrics: LatencyMetrics, process_time_header: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.process_time_header = process_time_header
+        self._route_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.process_time_header:
+                    process_time = (time.perf_counter_ns() - start) / 1e9
+                    message["headers"] = [
+                        *message.get("headers", ()), (b"x-process-time", str(process_time).encode())
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.observe(
+                self._route_path(scope), scope["method"], status, time.perf_counter_ns() - start
+            )
+
+    def _route_path(self, scope) -> str:
+        """Label requests by route template, unknown paths share one label"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "<unmatched>"
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, "<unmatched>")
+
+
+latency_metrics = LatencyMetrics()
+app.add_middleware(
+    LatencyMetricsMiddleware, metrics=latency_metrics, process_time_header=PROCESS_TIME_HEADER
+)
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(latency_metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get('/')
@@ -0,0 +1,122 @@
+"""Partial updates that only validate and encode the fields that change.
+
+The usual FastAPI recipe for a partial update rebuilds the stored model,
+dumps the request with exclude_unset, copies the model with the update and
+encodes the whole result again, four copies of the record for every patch.
+Here each field in the patch is validated on its own with the model's field
+definition, encoded on its own, compared with the stored value and only the
+differences are written back.
+
+Patches follow JSON Merge Patch (RFC 7396): null resets a field to its
+default, a nested object is merged into the stored object member by member.
+Models with root validators depend on the whole record, they are validated
+as a whole instead.
+"""
+from typing import Dict, List, Type
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+
+MISSING = object()
+
+# model -> {alias or name: ModelField}
+_patch_fields: Dict[type, dict] = {}
+
+
+def merge_patch(target, patch):
+    """RFC 7396 merge of `patch` into `target`, returns a new value"""
+    if not isinstance(patch, dict):
+        return patch
+    merged = dict(target) if isinstance(target, dict) else {}
+    for name, value in patch.items():
+        if value is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = merge_patch(merged.get(name), value)
+    return merged
+
+
+def _fields_by_alias(model: Type[BaseModel]) -> dict:
+    fields = _patch_fields.get(model)
+    if fields is None:
+        fields = {field.alias: field for field in model.__fields__.values()}
+        if model.__config__.allow_population_by_field_name:
+            fields.update(model.__fields__)
+        _patch_fields[model] = fields
+    return fields
+
+
+def _has_root_validators(model: Type[BaseModel]) -> bool:
+    return bool(model.__pre_root_validators__ or model.__post_root_validators__)
+
+
+def diff_patch(model: Type[BaseModel], current: dict, patch: dict, merge: bool = True) -> Dict[str, object]:
+    """Validate the fields of `patch` against `model` and return the encoded
+    values that differ from `current`, keyed by field name.
+
+    Unknown fields are ignored like pydantic does by default. Invalid values
+    raise RequestValidationError so the route answers 422 as usual.
+    """
+    if _has_root_validators(model):
+        return _diff_whole(model, current, patch, merge)
+
+    fields = _fields_by_alias(model)
+    changes = {}
+    errors = []
+    for key, value in patch.items():
+        field = fields.get(key)
+        if field is None:
+            continue
+        stored = current.get(field.name, MISSING)
+        if merge and value is None:
+            if field.required:
+                errors.append(ErrorWrapper(MissingError(), loc=("body", key)))
+                continue
+            value = field.get_default()
+        elif merge and isinstance(value, dict) and isinstance(stored, dict):
+            value = merge_patch(stored, value)
+        validated, error = field.validate(value, {}, loc=("body", key), cls=model)
+        if error:
+            errors.extend(error if isinstance(error, list) else [error])
+            continue
+        encoded = jsonable_encoder(validated)
+        if encoded != stored:
+            changes[field.name] = encoded
+    if errors:
+        raise RequestValidationError(errors)
+    return changes
+
+
+def diff_validated(instance: BaseModel, current: dict) -> Dict[str, object]:
+    """diff_patch for a body FastAPI has already validated, eg. a PUT with
+    `item: Item`. The fields set on `instance` are encoded and compared with
+    `current`, none of them is validated a second time.
+    """
+    changes = {}
+    for name in instance.__fields__:
+        # in field order, __fields_set__ is an unordered set
+        if name not in instance.__fields_set__:
+            continue
+        encoded = jsonable_encoder(getattr(instance, name))
+        if encoded != current.get(name, MISSING):
+            changes[name] = encoded
+    return changes
+
+
+def _diff_whole(model: Type[BaseModel], current: dict, patch: dict, merge: bool) -> Dict[str, object]:
+    merged = merge_patch(current, patch) if merge else {**current, **patch}
+    try:
+        updated = jsonable_encoder(model(**merged))
+    except ValidationError as exc:
+        raise RequestValidationError([ErrorWrapper(exc, loc="body")])
+    return {name: value for name, value in updated.items() if current.get(name, MISSING) != value}
+
+
+def apply_patch(model: Type[BaseModel], target: dict, patch: dict, merge: bool = True) -> List[str]:
+    """Apply `patch` to the stored dict `target` in place, returns the names of the changed fields"""
+    changes = diff_patch(model, target, patch, merge=merge)
+    target.update(changes)
+    return list(changes)
@@ -0,0 +1,165 @@
+"""On-demand profiling of single requests.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` or, with
+PROFILE_SAMPLE_EVERY=N, once every N requests. While it runs a background
+thread samples the Python stacks every PROFILE_INTERVAL seconds. The
+result is written as collapsed stacks (flamegraph.pl / speedscope input)
+into PROFILE_DIR, which keeps at most PROFILE_KEEP files. The stored
+profiles are listed at GET /admin/profiles.
+
+Every running thread is sampled (the event loop and the threadpool running
+sync routes), so requests running concurrently show up in the profile too.
+"""
+import hmac
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# innermost frames of a thread that is only waiting for work
+IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+
+class StackSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Ring of profile files on disk, the oldest are removed past `keep`"""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, method: str, path: str, duration: float, collapsed: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+        name = f"{time.time_ns()}-{method}-{slug}-{duration * 1000:.0f}ms.collapsed"
+        with open(os.path.join(self.directory, name), "w") as profile_file:
+            profile_file.write(collapsed)
+        for old in self.list()[self.keep:]:
+            os.remove(os.path.join(self.directory, old["name"]))
+        return name
+
+    def list(self) -> list:
+        """Stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(".collapsed")), reverse=True)
+        return [
+            {"name": name, "size": os.path.getsize(os.path.join(self.directory, name))}
+            for name in names
+        ]
+
+    def read(self, name: str) -> str:
+        if os.path.basename(name) != name or not name.endswith(".collapsed"):
+            raise FileNotFoundError(name)
+        with open(os.path.join(self.directory, name)) as profile_file:
+            return profile_file.read()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, requests that are not profiled only pay a header lookup"""
+
+    def __init__(self, app, store: ProfileStore, token: str = PROFILE_TOKEN,
+                 sample_every: int = PROFILE_SAMPLE_EVERY, interval: float = PROFILE_INTERVAL):
+        self.app = app
+        self.store = store
+        self.token = token.encode()
+        self.sample_every = sample_every
+        self.interval = interval
+        self._requests = itertools.count(1)
+
+    def _wanted(self, scope) -> bool:
+        if self.sample_every and next(self._requests) % self.sample_every == 0:
+            return True
+        if not self.token:
+            return False
+        # constant time, the token must not leak through response timings
+        return any(
+            name == b"x-profile" and hmac.compare_digest(value, self.token) for name, value in scope["headers"]
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        sampler = StackSampler(self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            await run_in_threadpool(
+                self.store.save, scope["method"], scope["path"],
+                time.perf_counter() - started, sampler.collapsed(),
+            )
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+
+async def verify_profile_token(x_profile_token: str = Header(default="")):
+    if not PROFILE_TOKEN or not hmac.compare_digest(x_profile_token.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="X-Profile-Token header invalid")
+
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin"], dependencies=[Depends(verify_profile_token)])
+
+
+@router.get("/")
+def list_profiles():
+    return profile_store.list()
+
+
+@router.get("/{name}", response_class=PlainTextResponse)
+def read_profile(name: str):
+    try:
+        return profile_store.read(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
@@ -0,0 +1,154 @@
+"""Indexed in-memory store for the Item-shaped example data.
+
+Records use __slots__ instead of a dict per item. The repository keeps:
+
+- a primary index (dict) plus the ids in insertion order for skip/limit,
+- a tag index, per tag the insertion sequence numbers and ids in order,
+- a price index, the prices sorted next to their ids for range queries.
+
+Lookups, pages of any index and range bounds never scan the whole store.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ItemRecord:
+    __slots__ = ("id", "name", "description", "price", "tax", "tags", "seq")
+
+    def __init__(self, id: str, name: str, price: float, description: Optional[str] = None,
+                 tax: Optional[float] = None, tags: Iterable[str] = (), seq: int = 0):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.price = price
+        self.tax = tax
+        self.tags = list(tags)
+        # position in insertion order, keeps the tag pages in the same order as list()
+        self.seq = seq
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "price": self.price,
+            "tax": self.tax,
+            "tags": self.tags,
+        }
+
+
+class ItemRepository:
+    def __init__(self):
+        self._records: Dict[str, ItemRecord] = {}
+        self._order: List[str] = []
+        self._next_seq = 0
+        self._by_tag: Dict[str, Tuple[List[int], List[str]]] = {}
+        self._prices: List[float] = []
+        self._price_ids: List[str] = []
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ItemRepository":
+        """Bulk load, the price index is sorted once instead of an insert per record"""
+        repository = cls()
+        for item_id, fields in data.items():
+            record = repository._make_record(item_id, fields)
+            repository._records[item_id] = record
+            repository._order.append(item_id)
+            for tag in record.tags:
+                seqs, ids = repository._by_tag.setdefault(tag, ([], []))
+                seqs.append(record.seq)
+                ids.append(item_id)
+        by_price = sorted(repository._records.values(), key=lambda record: record.price)
+        repository._prices = [record.price for record in by_price]
+        repository._price_ids = [record.id for record in by_price]
+        return repository
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._records
+
+    def get(self, item_id: str) -> Optional[ItemRecord]:
+        return self._records.get(item_id)
+
+    def put(self, item_id: str, fields: dict) -> ItemRecord:
+        """Insert or replace the whole record, a replaced record keeps its position"""
+        previous = self._records.get(item_id)
+        if previous is not None:
+            self._unindex(previous)
+        else:
+            self._order.append(item_id)
+        record = self._make_record(item_id, fields, previous.seq if previous is not None else None)
+        self._records[item_id] = record
+        self._index(record)
+        return record
+
+    def update(self, item_id: str, changes: dict) -> ItemRecord:
+        """Apply `changes` to the stored record in place, only touching the indexes that change"""
+        record = self._records[item_id]
+        reindex = "price" in changes or "tags" in changes
+        if reindex:
+            self._unindex(record)
+        for name, value in changes.items():
+            setattr(record, name, list(value) if name == "tags" else value)
+        if reindex:
+            self._index(record)
+        return record
+
+    def delete(self, item_id: str):
+        record = self._records.pop(item_id)
+        self._unindex(record)
+        self._order.remove(item_id)
+
+    def list(self, skip: int = 0, limit: int = 100) -> List[ItemRecord]:
+        return [self._records[item_id] for item_id in self._order[skip:skip + limit]]
+
+    def with_tag(self, tag: str, skip: int = 0, limit: int = 100) -> List[ItemRecord]:
+        """Records carrying `tag`, in insertion order"""
+        _, ids = self._by_tag.get(tag, ((), ()))
+        return [self._records[item_id] for item_id in ids[skip:skip + limit]]
+
+    def price_between(self, low: float = None, high: float = None, skip: int = 0, limit: int = 100) -> List[ItemRecord]:
+        """Records priced within [low, high], cheapest first"""
+        start = 0 if low is None else bisect_left(self._prices, low)
+        end = len(self._prices) if high is None else bisect_right(self._prices, high)
+        start = min(start + skip, end)
+        return [self._records[item_id] for item_id in self._price_ids[start:min(start + limit, end)]]
+
+    def _make_record(self, item_id: str, fields: dict, seq: int = None) -> ItemRecord:
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        return ItemRecord(
+            item_id,
+            fields["name"],
+            fields["price"],
+            description=fields.get("description"),
+            tax=fields.get("tax"),
+            tags=fields.get("tags") or (),
+            seq=seq,
+        )
+
+    def _index(self, record: ItemRecord):
+        for tag in record.tags:
+            seqs, ids = self._by_tag.setdefault(tag, ([], []))
+            position = bisect_left(seqs, record.seq)
+            seqs.insert(position, record.seq)
+            ids.insert(position, record.id)
+        position = bisect_right(self._prices, record.price)
+        self._prices.insert(position, record.price)
+        self._price_ids.insert(position, record.id)
+
+    def _unindex(self, record: ItemRecord):
+        for tag in record.tags:
+            seqs, ids = self._by_tag[tag]
+            position = bisect_left(seqs, record.seq)
+            del seqs[position]
+            del ids[position]
+            if not seqs:
+                del self._by_tag[tag]
+        position = bisect_left(self._prices, record.price)
+        while self._price_ids[position] != record.id:
+            position += 1
+        del self._prices[position]
+        del self._price_ids[position]
@@ -0,0 +1,212 @@
+"""Route-level cache of final response bytes for deterministic GET routes.
+
+Mark an endpoint with `@cached("store")` and register it on a router whose
+route_class is CachedRoute. The first request runs the endpoint as usual
+(response_model validation, include/exclude filtering, JSON encoding), the
+encoded body is kept per path and query string, and later requests replay
+it without calling the endpoint at all. Every entry carries an ETag, a
+matching If-None-Match is answered with 304.
+
+Entries are grouped by the tags given to `cached`, routes that mutate a
+store call `response_cache.invalidate("store")`.
+
+Bodies of at least RESPONSE_CACHE_COMPRESS_MIN bytes are also served gzip
+(or brotli, when installed) to clients that accept it. Each variant is
+compressed the first time it is asked for and kept next to the plain body,
+so the CPU cost is paid once per entry rather than once per request.
+"""
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import brotli
+except ImportError:  # optional, pip install brotli
+    brotli = None
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "4096"))
+RESPONSE_CACHE_COMPRESS_MIN = int(os.getenv("RESPONSE_CACHE_COMPRESS_MIN", "1024"))
+
+# preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# headers of the original response that make sense to replay
+REPLAYED_HEADERS = ("content-type",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11)
+    # mtime=0 keeps the bytes, and so the ETag, stable
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class CachedResponse:
+    __slots__ = ("body", "status_code", "headers", "etag", "compressible", "variants")
+
+    def __init__(self, body: bytes, status_code: int, headers: dict):
+        self.body = body
+        self.status_code = status_code
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.compressible = len(body) >= RESPONSE_CACHE_COMPRESS_MIN
+        self.headers = {**headers, "etag": self.etag}
+        if self.compressible:
+            self.headers["vary"] = "Accept-Encoding"
+        # encoding -> (body, headers), filled on first use
+        self.variants = {}
+
+    def variant(self, encoding: str):
+        """The body and headers to send for `encoding`, None is the plain body"""
+        if encoding is None:
+            return self.body, self.headers
+        variant = self.variants.get(encoding)
+        if variant is None:
+            body = compress(self.body, encoding)
+            # a representation of its own, so an ETag of its own
+            etag = f'{self.etag[:-1]}-{encoding}"'
+            variant = self.variants[encoding] = (body, {**self.headers, "etag": etag, "content-encoding": encoding})
+        return variant
+
+
+class ResponseCache:
+    """Bounded LRU of CachedResponse keyed by (path, normalized query)"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        # bumped on invalidate, a response computed across an invalidation is not stored
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self, tags) -> tuple:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def store(self, key, response: CachedResponse, tags, generation: tuple) -> bool:
+        if generation != self.generation(tags):
+            return False
+        self._entries[key] = (response, tags)
+        self._entries.move_to_end(key)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, (_, old_tags) = self._entries.popitem(last=False)
+            for tag in old_tags:
+                self._keys_by_tag[tag].discard(old_key)
+        return True
+
+    def invalidate(self, tag: str):
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        for key in self._keys_by_tag.pop(tag, ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        for tag in list(self._keys_by_tag):
+            self.invalidate(tag)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def cached(*tags: str):
+    """Cache the responses of a GET endpoint until one of `tags` is invalidated"""
+    def decorate(endpoint):
+        endpoint.response_cache_tags = tags or (endpoint.__name__,)
+        return endpoint
+    return decorate
+
+
+def cache_key(request: Request) -> tuple:
+    # ?a=1&b=2 and ?b=2&a=1 are the same response
+    query = urlencode(sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+    return request.url.path, query
+
+
+def negotiate(accept_encoding: str, available: tuple = ENCODINGS):
+    """Pick the encoding from `available` the client ranks highest, None for identity.
+
+    Ties keep the order of `available`, q=0 refuses an encoding and `*`
+    covers anything not named.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class CachedRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        tags = getattr(self.endpoint, "response_cache_tags", None)
+        if tags is None or self.methods != {"GET"}:
+            return handler
+
+        async def cached_route_handler(request: Request) -> Response:
+            key = cache_key(request)
+            entry = response_cache.get(key)
+            if entry is None:
+                generation = response_cache.generation(tags)
+                response = await handler(request)
+                # errors, streaming bodies and anything with side effects go out as is
+                if not 200 <= response.status_code < 300 or not hasattr(response, "body") or response.background:
+                    return response
+                headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+                entry = CachedResponse(response.body, response.status_code, headers)
+                response_cache.store(key, entry, tags, generation)
+            encoding = negotiate(request.headers.get("accept-encoding")) if entry.compressible else None
+            body, headers = entry.variant(encoding)
+            if etag_matches(request, headers["etag"]):
+                response_cache.not_modified += 1
+                return Response(status_code=304, headers={"etag": headers["etag"]})
+            return Response(body, status_code=entry.status_code, headers=headers)
+
+        return cached_route_handler
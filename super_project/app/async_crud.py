@@ -0,0 +1,107 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app import models, schemas
+from app.broadcast import publish_item_created
+from app.cache import user_cache
+
+
+# Async counterparts of app.crud. Relationships can not be lazy loaded on an
+# AsyncSession, so everything a response schema touches is loaded up front.
+
+
+async def get_user(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.User)
+        .options(selectinload(models.User.items))
+        .filter(models.User.id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(
+        select(models.User).filter(models.User.email == email)
+    )
+    return result.scalars().first()
+
+
+async def get_user_cached(db: AsyncSession, user_id: int):
+    user = user_cache.lookup_user(user_id)
+    if user is None:
+        # taken before the await, an invalidation while it is suspended voids the store
+        version = user_cache.version(user_id)
+        user = user_cache.store(await get_user(db, user_id), version)
+    return user
+
+
+async def get_user_by_email_cached(db: AsyncSession, email: str):
+    user = user_cache.lookup_user_by_email(email)
+    if user is None:
+        version = user_cache.version()
+        # cached users carry their items, so load them with the user
+        result = await db.execute(
+            select(models.User)
+            .options(selectinload(models.User.items))
+            .filter(models.User.email == email)
+        )
+        user = user_cache.store(result.scalars().first(), version)
+    return user
+
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(models.User)
+        .options(selectinload(models.User.items))
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def get_users_after(db: AsyncSession, after_id: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(models.User)
+        .options(selectinload(models.User.items))
+        .filter(models.User.id > after_id)
+        .order_by(models.User.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    fake_hashed_password = user.password + "notreallyhashed"
+    # a new user owns no items, starting with an empty collection avoids a lazy load
+    db_user = models.User(
+        email=user.email, hashed_password=fake_hashed_password, items=[])
+    db.add(db_user)
+    # expire_on_commit=False keeps the flushed id and defaults, so no refresh round trip
+    await db.commit()
+    user_cache.invalidate_user(db_user.id, db_user.email)
+    return db_user
+
+
+async def get_items(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Item).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_items_after(db: AsyncSession, after_id: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(models.Item)
+        .filter(models.Item.id > after_id)
+        .order_by(models.Item.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def create_user_item(db: AsyncSession, item: schemas.ItemCreate, user_id: int):
+    db_item = models.Item(**item.dict(), owner_id=user_id)
+    db.add(db_item)
+    await db.commit()
+    user_cache.invalidate_user(user_id)
+    publish_item_created(db_item)
+    return db_item
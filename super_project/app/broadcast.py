@@ -0,0 +1,139 @@
+"""In-process fan-out of change events to WebSocket subscribers.
+
+An event is encoded once and appended to every subscriber's bounded queue on
+the event loop. publish() may be called from any thread (the sync routes run
+in the threadpool, the write coalescer commits on its own thread), it hands
+the event to the loop with call_soon_threadsafe. Once that loop is closed
+events are dropped, publishing never fails the write that triggered it.
+
+A subscriber whose queue is full is slow, what happens to it depends on the
+policy:
+
+- "coalesce": its backlog is replaced by a single overflow message carrying
+  the number of events it missed, the client resyncs with GET /items/.
+- "drop": the subscription is closed, the client reconnects.
+
+Only one process sees the events, with several workers each one feeds its
+own subscribers.
+"""
+import asyncio
+from collections import deque
+
+import orjson
+
+from app.config import settings
+from app.fast_json import item_dict
+
+
+class Subscription:
+    __slots__ = ("queue", "maxsize", "missed", "closed", "_wakeup")
+
+    def __init__(self, maxsize: int):
+        self.queue = deque()
+        self.maxsize = maxsize
+        self.missed = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+
+    def put(self, message: str, policy: str) -> bool:
+        """Queue `message`, False when the subscriber is too slow and has to go"""
+        if len(self.queue) >= self.maxsize:
+            if policy == "drop":
+                self.close()
+                return False
+            # the backlog and this event are skipped, get() reports how many
+            self.missed += len(self.queue) + 1
+            self.queue.clear()
+        else:
+            self.queue.append(message)
+        self._wakeup.set()
+        return True
+
+    async def get(self):
+        """The next message, None once the subscription is closed"""
+        while not self.queue and not self.missed:
+            if self.closed:
+                return None
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        if self.missed:
+            # everything still queued arrived after the skipped events
+            missed, self.missed = self.missed, 0
+            return orjson.dumps({"type": "overflow", "missed": missed}).decode()
+        return self.queue.popleft()
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.missed = 0
+        self._wakeup.set()
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = 256, policy: str = "coalesce"):
+        if policy not in ("coalesce", "drop"):
+            raise ValueError(f"Unknown slow consumer policy: {policy!r}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self._subscribers = set()
+        self._loop = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> Subscription:
+        """Must be called on the event loop serving the subscribers"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        subscription.close()
+
+    def publish(self, event: dict):
+        loop = self._loop
+        # nobody listening, not even worth encoding
+        if loop is None or not self._subscribers:
+            return
+        message = orjson.dumps(event).decode()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(message)
+            return
+        # the loop the subscribers were on may be gone (shutdown, a test client's
+        # portal), the feed is best effort and must never fail the write
+        if loop.is_closed():
+            self._loop = None
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, message)
+        except RuntimeError:
+            # closed between the check and the call
+            self._loop = None
+
+    def _fan_out(self, message: str):
+        self.published += 1
+        slow = [subscription for subscription in self._subscribers if not subscription.put(message, self.policy)]
+        for subscription in slow:
+            self._subscribers.discard(subscription)
+        self.dropped += len(slow)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+item_feed = Broadcaster(queue_size=settings.feed_queue_size, policy=settings.feed_slow_consumer)
+
+
+def publish_item_created(db_item):
+    item_feed.publish({"type": "item_created", "item": item_dict(db_item)})
@@ -0,0 +1,186 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from app import schemas
+from app.config import settings
+
+
+class CacheBackend(ABC):
+    """Storage used by UserCache, a shared store such as Redis only has to
+    implement these three methods (values must then be picklable)
+    """
+
+    @abstractmethod
+    def get(self, key: str):
+        """Return the stored value or None"""
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float):
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        pass
+
+
+class NullCache(CacheBackend):
+    """Backend used when caching is disabled"""
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value, ttl: float):
+        pass
+
+    def delete(self, *keys: str):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """Bounded in-process LRU with a per entry TTL.
+
+    Each worker process has its own, an update handled by one worker only
+    invalidates that worker's copy, the others keep serving the old user
+    until the TTL runs out.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class UserCache:
+    """Read-through cache for user lookups.
+
+    Users are cached by id as `schemas.User`, lookups by email only store a
+    pointer to the id so dropping the id entry invalidates both.
+
+    A load can race with an invalidation: the row is read, another request
+    commits a change and invalidates, then the old row would be stored and
+    served until the TTL runs out. Loaders take `version()` before reading
+    and store() drops the write when the user was invalidated since, like
+    the generations of examples/response_cache.py.
+    """
+
+    # versions are kept in a fixed number of slots, two users sharing a slot
+    # only costs a skipped store
+    VERSION_SLOTS = 4096
+
+    def __init__(self, backend: CacheBackend, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._versions = [0] * self.VERSION_SLOTS
+        # bumped by every invalidation, for loads by email where the id is not known yet
+        self._invalidations = 0
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _current(self, user_id):
+        if user_id is None:
+            return None, self._invalidations
+        return user_id, self._versions[user_id % self.VERSION_SLOTS]
+
+    def version(self, user_id: int = None) -> tuple:
+        """Taken before loading a user, by id or (without `user_id`) by email"""
+        with self._lock:
+            return self._current(user_id)
+
+    def lookup_user(self, user_id: int):
+        user = self.backend.get(f"user:id:{user_id}")
+        self._count(user is not None)
+        return user
+
+    def lookup_user_by_email(self, email: str):
+        user_id = self.backend.get(f"user:email:{email}")
+        user = self.backend.get(f"user:id:{user_id}") if user_id is not None else None
+        self._count(user is not None)
+        return user
+
+    def store(self, db_user, version: tuple):
+        """Cache an ORM user loaded after `version()` and return it as a schemas.User"""
+        # misses are not cached, POST /users/ checks each new email only once
+        if db_user is None:
+            return None
+        user = schemas.User.from_orm(db_user)
+        with self._lock:
+            # invalidated while it was loaded, the row may predate the change
+            if self._current(version[0]) != version:
+                return user
+            self.backend.set(f"user:id:{user.id}", user, self.ttl)
+            self.backend.set(f"user:email:{user.email}", user.id, self.ttl)
+        return user
+
+    def get_user(self, user_id: int, load):
+        """Return the cached user or cache the ORM row returned by `load()`"""
+        user = self.lookup_user(user_id)
+        if user is None:
+            version = self.version(user_id)
+            user = self.store(load(), version)
+        return user
+
+    def get_user_by_email(self, email: str, load):
+        user = self.lookup_user_by_email(email)
+        if user is None:
+            version = self.version()
+            user = self.store(load(), version)
+        return user
+
+    def invalidate_user(self, user_id: int, email: str = None):
+        # bumped before the delete, a store() racing with it either lands
+        # before the delete or sees the new version and skips
+        with self._lock:
+            self._versions[user_id % self.VERSION_SLOTS] += 1
+            self._invalidations += 1
+        keys = [f"user:id:{user_id}"]
+        if email is not None:
+            keys.append(f"user:email:{email}")
+        self.backend.delete(*keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(
+    MemoryCache(settings.user_cache_size) if settings.user_cache_size else NullCache(),
+    ttl=settings.user_cache_ttl,
+)
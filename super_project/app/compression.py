@@ -0,0 +1,170 @@
+"""Response compression negotiated with Accept-Encoding.
+
+gzip always, brotli as well when the `brotli` package is installed (it is
+preferred at equal q-values, it is smaller for the same CPU). Complete
+bodies under `minimum_size` are sent as they are. Streaming responses, eg.
+the NDJSON exports, are fed to the compressor chunk by chunk and whatever it
+emits is sent on. Responses that already carry a Content-Encoding (a body
+stored precompressed) pass through untouched.
+"""
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional, pip install brotli
+    brotli = None
+
+# already compressed or not worth it
+SKIPPED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "font/woff")
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, available: tuple) -> Optional[str]:
+    """Pick the encoding from `available` the client ranks highest, None for identity.
+
+    Ties keep the order of `available`, q=0 refuses an encoding and `*`
+    covers anything not named.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Compressor:
+    """One streaming compressor, gzip through zlib or brotli"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    compressor = Compressor(encoding, gzip_level, brotli_quality)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.available = supported_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, self.available)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await CompressedResponder(self, encoding, send)(scope, receive)
+
+
+class CompressedResponder:
+    """Holds back http.response.start until the first body message says
+    whether the response is complete and big enough to compress
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive):
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = dict(message.get("headers", ()))
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            self.passthrough = (
+                b"content-encoding" in headers
+                or content_type.startswith(SKIPPED_TYPES)
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compressor = Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                await self.send(self._compressed_start(len(compressed)))
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # streaming, the length is unknown until the end
+            await self.send(self._compressed_start(None))
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            await self.send({"type": "http.response.body", "body": chunk + self.compressor.finish()})
+        elif chunk:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    def _compressed_start(self, content_length: Optional[int]) -> dict:
+        headers = [
+            (name, value) for name, value in self.start.get("headers", ())
+            if name not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start.get("headers", ()) if name == b"vary"]
+        vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return {**self.start, "headers": headers}
@@ -1,6 +1,8 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app import models, schemas
+from app.broadcast import publish_item_created
+from app.cache import user_cache
 
 
 def get_user(db: Session, user_id: int):
@@ -11,17 +13,58 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
+def get_user_cached(db: Session, user_id: int):
+    """Like get_user but served from the user cache, returns a schemas.User"""
+    return user_cache.get_user(user_id, lambda: get_user(db, user_id))
+
+
+def get_user_by_email_cached(db: Session, email: str):
+    # cached users carry their items, so load them with the user
+    return user_cache.get_user_by_email(
+        email,
+        lambda: db.query(models.User)
+        .options(selectinload(models.User.items))
+        .filter(models.User.email == email)
+        .first(),
+    )
+
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+    # load every owner's items in one extra query instead of one lazy load per user
+    return (
+        db.query(models.User)
+        .options(selectinload(models.User.items))
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
 
-def create_user(db: Session, user: schemas.UserCreate):
+def get_users_after(db: Session, after_id: int = 0, limit: int = 100):
+    """Keyset pagination: seek past the last seen primary key instead of counting rows with OFFSET"""
+    return (
+        db.query(models.User)
+        .options(selectinload(models.User.items))
+        .filter(models.User.id > after_id)
+        .order_by(models.User.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def build_user(user: schemas.UserCreate):
     fake_hashed_password = user.password + "notreallyhashed"
-    db_user = models.User(
-        email=user.email, hashed_password=fake_hashed_password)
+    # a new user owns no items, starting with an empty collection avoids a lazy load
+    return models.User(
+        email=user.email, hashed_password=fake_hashed_password, items=[])
+
+
+def create_user(db: Session, user: schemas.UserCreate):
+    db_user = build_user(user)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_cache.invalidate_user(db_user.id, db_user.email)
     return db_user
 
 
@@ -29,9 +72,26 @@ def get_items(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Item).offset(skip).limit(limit).all()
 
 
+def get_items_after(db: Session, after_id: int = 0, limit: int = 100):
+    return (
+        db.query(models.Item)
+        .filter(models.Item.id > after_id)
+        .order_by(models.Item.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def build_user_item(item: schemas.ItemCreate, user_id: int):
+    return models.Item(**item.dict(), owner_id=user_id)
+
+
 def create_user_item(db: Session, item: schemas.ItemCreate, user_id: int):
-    db_item = models.Item(**item.dict(), owner_id=user_id)
+    db_item = build_user_item(item, user_id)
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    # the owner's cached items list is now stale
+    user_cache.invalidate_user(user_id)
+    publish_item_created(db_item)
     return db_item
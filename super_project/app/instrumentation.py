@@ -0,0 +1,130 @@
+import logging
+import threading
+
+from fastapi import FastAPI
+
+from app.config import settings
+from app.database import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryReport:
+    """Per-route totals of the SQL run by each request"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route: str, stats):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_time_ms": 0.0,
+                    "slowest_ms": 0.0,
+                    "slowest_statement": None,
+                }
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["db_time_ms"] += stats.total * 1000
+            if stats.slowest * 1000 > entry["slowest_ms"]:
+                entry["slowest_ms"] = stats.slowest * 1000
+                entry["slowest_statement"] = stats.slowest_statement
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **entry,
+                    "queries_per_request": round(entry["queries"] / entry["requests"], 2),
+                    "db_time_ms": round(entry["db_time_ms"], 3),
+                    "slowest_ms": round(entry["slowest_ms"], 3),
+                }
+                for route, entry in sorted(self._routes.items())
+            }
+
+
+query_report = QueryReport()
+
+
+def route_template(scope) -> str:
+    """The path the request was routed to, eg. /users/{user_id}, so the report
+    keeps one entry per route rather than one per URL
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "<unmatched>"
+    for route in scope["app"].routes:
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return scope["path"]
+
+
+class QueryInstrumentationMiddleware:
+    """Counts the SQL of each request until its body is complete.
+
+    Pure ASGI rather than BaseHTTPMiddleware: call_next returns as soon as the
+    response starts, so the statements a StreamingResponse runs while the
+    body is produced (the /export routes) would be missed. Here the stats are
+    recorded once the app is done, and the start message is held back until
+    the first body message so complete responses get their X-DB-* headers
+    with the final numbers. A streaming response has not run its queries yet
+    when its headers go out, it gets no X-DB-* headers but is still recorded
+    in /debug/queries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # in debug mode going over the budget fails the request, so N+1 regressions
+        # surface in development and tests rather than as a log line
+        budget = settings.query_budget if settings.debug else 0
+        with track_queries(budget) as stats:
+            start = None
+
+            async def send_wrapper(message):
+                nonlocal start
+                if message["type"] == "http.response.start" and settings.debug:
+                    start = message
+                    return
+                if start is not None:
+                    if not message.get("more_body", False):
+                        start = with_query_headers(start, stats)
+                    await send(start)
+                    start = None
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        query_report.add(f"{scope['method']} {route_template(scope)}", stats)
+        # guard against N+1 regressions such as lazy loading User.items per row
+        if settings.query_budget and stats.count > settings.query_budget:
+            logger.warning(
+                "%s %s ran %d SQL statements (budget %d)",
+                scope["method"], scope["path"], stats.count, settings.query_budget,
+            )
+
+
+def with_query_headers(start: dict, stats) -> dict:
+    headers = list(start.get("headers", ()))
+    headers += [
+        (b"x-db-query-count", str(stats.count).encode()),
+        (b"x-db-time-ms", f"{stats.total * 1000:.3f}".encode()),
+        (b"x-db-slowest-ms", f"{stats.slowest * 1000:.3f}".encode()),
+    ]
+    return {**start, "headers": headers}
+
+
+def install(app: FastAPI):
+    """Only pay for the middleware when something reads what it records"""
+    if settings.debug or settings.sql_report or settings.query_budget:
+        app.add_middleware(QueryInstrumentationMiddleware)
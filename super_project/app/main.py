@@ -1,56 +1,133 @@
-from typing import List
+from typing import List, Union
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app import crud, models, schemas
-from app.database import SessionLocal, engine
+from app import crud, instrumentation, models, schemas, search
+from app.compression import CompressionMiddleware
+from app.broadcast import publish_item_created
+from app.cache import user_cache
+from app.config import settings
+from app.database import WriteSessionLocal, engine
+from app.dependencies import get_db
+from app.fast_json import dump_items, dump_users, list_response
+from app.pagination import read_cursor, set_next_cursor
+from app.routes import debug, exports, feed
+from app.routes import search as search_routes
+from app.writes import WriteCoalescer
 
 # creating the database app_db.sqlite inside the app folder
 models.Base.metadata.create_all(bind=engine)
+search.create_search_index(engine)
 
 app = FastAPI()
+instrumentation.install(app)
+if settings.compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.gzip_level,
+        brotli_quality=settings.brotli_quality,
+    )
 
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+writer = None
+if settings.write_coalescing:
+    writer = WriteCoalescer(
+        WriteSessionLocal,
+        window=settings.write_batch_window_ms / 1000,
+        max_batch=settings.write_batch_max_size,
+    )
+    app.on_event("startup")(writer.start)
+    app.on_event("shutdown")(writer.stop)
+
+
+# CRUD routes served from the threadpool, see app.routes.async_api for the async mode
+router = APIRouter()
 
 
-@app.post("/users/", response_model=schemas.User)
+@router.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = crud.get_user_by_email_cached(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
-
-
-@app.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    if writer is None:
+        return crud.create_user(db=db, user=user)
+    try:
+        db_user = writer.add(lambda: crud.build_user(user))
+    except IntegrityError:
+        # another request in the same batch registered the email first
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user_cache.invalidate_user(db_user.id, db_user.email)
+    return db_user
 
 
-@app.get("/users/{user_id}", response_model=schemas.User)
+@router.get("/users/", response_model=List[schemas.User])
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Union[str, None] = None,
+    db: Session = Depends(get_db),
+):
+    """Passing `cursor` (empty for the first page) switches to keyset pagination,
+    the cursor for the following page is returned in the X-Next-Cursor header
+    """
+    if cursor is None:
+        users = crud.get_users(db, skip=skip, limit=limit)
+    else:
+        users = crud.get_users_after(db, after_id=read_cursor(cursor), limit=limit + 1)
+        users = set_next_cursor(response, users, limit)
+    return list_response(users, dump_users, response)
+
+
+@router.get("/users/{user_id}", response_model=schemas.User)
 def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+    db_user = crud.get_user_cached(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
-@app.post("/users/{user_id}/items/", response_model=schemas.Item)
+@router.post("/users/{user_id}/items/", response_model=schemas.Item)
 def create_item_for_user(
     user_id: int, item: schemas.ItemCreate, db: Session = Depends(get_db)
 ):
-    return crud.create_user_item(db=db, item=item, user_id=user_id)
-
-
-@app.get("/items/", response_model=List[schemas.Item])
-def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = crud.get_items(db, skip=skip, limit=limit)
-    return items
+    if writer is None:
+        return crud.create_user_item(db=db, item=item, user_id=user_id)
+    db_item = writer.add(lambda: crud.build_user_item(item, user_id))
+    user_cache.invalidate_user(user_id)
+    publish_item_created(db_item)
+    return db_item
+
+
+@router.get("/items/", response_model=List[schemas.Item])
+def read_items(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Union[str, None] = None,
+    db: Session = Depends(get_db),
+):
+    if cursor is None:
+        items = crud.get_items(db, skip=skip, limit=limit)
+    else:
+        items = crud.get_items_after(db, after_id=read_cursor(cursor), limit=limit + 1)
+        items = set_next_cursor(response, items, limit)
+    return list_response(items, dump_items, response)
+
+
+if settings.debug:
+    # cache, SQL and feed internals, not for production
+    app.include_router(debug.router)
+app.include_router(exports.router)
+app.include_router(feed.router)
+app.include_router(search_routes.router)
+
+if settings.db_mode == "async":
+    from app.routes import async_api
+
+    app.include_router(async_api.router)
+else:
+    app.include_router(router)
@@ -0,0 +1,50 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, Response
+
+# the largest INTEGER SQLite (and BIGINT Postgres) can bind, a larger id can not exist
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+def encode_cursor(last_id: int) -> str:
+    """Turn the primary key of the last row on a page into an opaque cursor"""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Return the primary key a cursor points after, an empty cursor starts from the beginning"""
+    if not cursor:
+        return 0
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        last_id = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not 0 <= last_id <= MAX_CURSOR_ID:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return last_id
+
+
+def next_cursor(rows: list, limit: int):
+    """`rows` is fetched with limit + 1, the extra row only tells that there is
+    a next page, so the last page never hands out a cursor
+    """
+    if limit <= 0 or len(rows) <= limit:
+        return None
+    return encode_cursor(rows[limit - 1].id)
+
+
+def read_cursor(cursor: str) -> int:
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response: Response, rows: list, limit: int) -> list:
+    """Set X-Next-Cursor when there is a page after this one, return the page"""
+    cursor = next_cursor(rows, limit)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return rows[:limit]
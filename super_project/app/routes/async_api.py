@@ -0,0 +1,67 @@
+from typing import List, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import async_crud, schemas
+from app.dependencies import get_async_db
+from app.fast_json import dump_items, dump_users, list_response
+from app.pagination import read_cursor, set_next_cursor
+
+# Same routes as app.main served from the event loop, used when APP_DB_MODE=async
+router = APIRouter()
+
+
+@router.post("/users/", response_model=schemas.User)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user_by_email_cached(db, email=user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return await async_crud.create_user(db=db, user=user)
+
+
+@router.get("/users/", response_model=List[schemas.User])
+async def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Union[str, None] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if cursor is None:
+        users = await async_crud.get_users(db, skip=skip, limit=limit)
+    else:
+        users = await async_crud.get_users_after(db, after_id=read_cursor(cursor), limit=limit + 1)
+        users = set_next_cursor(response, users, limit)
+    return list_response(users, dump_users, response)
+
+
+@router.get("/users/{user_id}", response_model=schemas.User)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user_cached(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+
+@router.post("/users/{user_id}/items/", response_model=schemas.Item)
+async def create_item_for_user(
+    user_id: int, item: schemas.ItemCreate, db: AsyncSession = Depends(get_async_db)
+):
+    return await async_crud.create_user_item(db=db, item=item, user_id=user_id)
+
+
+@router.get("/items/", response_model=List[schemas.Item])
+async def read_items(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Union[str, None] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if cursor is None:
+        items = await async_crud.get_items(db, skip=skip, limit=limit)
+    else:
+        items = await async_crud.get_items_after(db, after_id=read_cursor(cursor), limit=limit + 1)
+        items = set_next_cursor(response, items, limit)
+    return list_response(items, dump_items, response)
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+
+from app.broadcast import item_feed
+from app.cache import user_cache
+from app.instrumentation import query_report
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/cache")
+def cache_stats():
+    return {"users": user_cache.stats()}
+
+
+@router.get("/feed")
+def feed_stats():
+    return {"items": item_feed.stats()}
+
+
+@router.get("/queries")
+def query_stats():
+    """SQL per route, recorded when APP_SQL_REPORT, APP_DEBUG or APP_QUERY_BUDGET is set"""
+    return query_report.as_dict()
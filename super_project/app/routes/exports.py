@@ -0,0 +1,58 @@
+import orjson
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.fast_json import item_dict, user_dict
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+NDJSON = "application/x-ndjson"
+
+
+def stream_rows(build_query, encode):
+    """Encode the rows a batch at a time as they come off the cursor.
+
+    yield_per fetches `export_chunk_size` rows at a time (a server side cursor
+    on Postgres), so memory stays flat whatever the table size. Each batch is
+    sent as one chunk: StreamingResponse runs a sync iterator in the
+    threadpool once per item, a chunk per row would pay a thread hop and an
+    ASGI message per row. The session is owned by the generator because it
+    outlives the request handler.
+    """
+    chunk_size = settings.export_chunk_size
+    db = SessionLocal()
+    try:
+        lines = []
+        for row in build_query(db).yield_per(chunk_size):
+            lines.append(orjson.dumps(encode(row)))
+            if len(lines) >= chunk_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        db.close()
+
+
+@router.get("/users")
+def export_users():
+    def build_query(db):
+        return (
+            db.query(models.User)
+            .options(selectinload(models.User.items))
+            .order_by(models.User.id)
+        )
+
+    return StreamingResponse(stream_rows(build_query, user_dict), media_type=NDJSON)
+
+
+@router.get("/items")
+def export_items():
+    def build_query(db):
+        return db.query(models.Item).order_by(models.Item.id)
+
+    return StreamingResponse(stream_rows(build_query, item_dict), media_type=NDJSON)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, WebSocket, status
+
+from app.broadcast import item_feed
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["feed"])
+
+
+@router.websocket("/ws/items")
+async def items_feed(websocket: WebSocket):
+    """Pushes an item_created message for every new item, instead of polling GET /items/.
+
+    A client that falls behind gets an overflow message with the number of
+    events it missed (or is disconnected, see APP_FEED_SLOW_CONSUMER) and
+    should resync with GET /items/.
+    """
+    await websocket.accept()
+    subscription = item_feed.subscribe()
+
+    async def forward():
+        while True:
+            message = await subscription.get()
+            if message is None:
+                # dropped as a slow consumer
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(message)
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        item_feed.unsubscribe(subscription)
+        for task in tasks:
+            task.cancel()
+        # collect both outcomes, a send failing because the client just went
+        # away is expected and must not end up as "exception was never retrieved"
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.debug("items feed closed by %r", result)
@@ -0,0 +1,20 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app import schemas, search
+from app.dependencies import get_db
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/items/search", response_model=List[schemas.Item])
+def search_items(
+    q: str = Query(min_length=1),
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
+    """Items matching every word of `q`, best matches first"""
+    return search.search_items(db, q=q, skip=skip, limit=limit)
@@ -0,0 +1,122 @@
+"""Full-text search over Item.title and Item.description.
+
+On SQLite the items are mirrored into an FTS5 table kept in sync by
+triggers, so every write path (crud, async crud, the write coalescer) is
+covered. Other databases fall back to a LIKE scan.
+
+Rows written before the index existed are added with:
+
+    python -m app.search rebuild
+"""
+import logging
+import sys
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts
+    USING fts5(title, description, content='items', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO items_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SEARCH_QUERY = text(
+    """
+    SELECT items.id, items.title, items.description, items.owner_id
+    FROM items_fts JOIN items ON items.id = items_fts.rowid
+    WHERE items_fts MATCH :match
+    ORDER BY bm25(items_fts), items.id
+    LIMIT :limit OFFSET :skip
+    """
+)
+
+fts_enabled = False
+
+
+def create_search_index(engine):
+    """Create the FTS5 table and its triggers, a no-op outside SQLite"""
+    global fts_enabled
+    if engine.dialect.name != "sqlite":
+        return
+    try:
+        with engine.begin() as conn:
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+    except OperationalError:
+        # sqlite built without FTS5
+        logger.warning("FTS5 is not available, item search falls back to LIKE")
+        return
+    fts_enabled = True
+
+
+def rebuild_search_index(engine):
+    """Re-index every row of the items table"""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+
+
+def to_match_query(q: str) -> str:
+    """Quote every term so user input can not use (or break) the FTS5 query syntax"""
+    terms = q.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_items(db: Session, q: str, skip: int = 0, limit: int = 100):
+    match = to_match_query(q)
+    if not match:
+        return []
+    if fts_enabled:
+        return (
+            db.query(models.Item)
+            .from_statement(SEARCH_QUERY)
+            .params(match=match, limit=limit, skip=skip)
+            .all()
+        )
+    pattern = f"%{q.strip()}%"
+    return (
+        db.query(models.Item)
+        .filter(or_(models.Item.title.ilike(pattern), models.Item.description.ilike(pattern)))
+        .order_by(models.Item.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.search rebuild")
+    models.Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    if not fts_enabled:
+        sys.exit("full-text search is only available on SQLite with FTS5")
+    rebuild_search_index(engine)
+    print("search index rebuilt")
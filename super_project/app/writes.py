@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteCoalescer:
+    """Group commit for creates.
+
+    Callers hand in a function building the ORM row. A single writer thread
+    collects everything that arrives within `window` seconds (up to
+    `max_batch` rows) and commits it as one transaction, so the fsync is paid
+    once per batch instead of once per row. When the batch commit fails, for
+    example because one row breaks the unique email constraint, the batch is
+    replayed one row per transaction so every caller gets its own row or its
+    own error.
+
+    `session_factory` must build sessions with expire_on_commit=False, the
+    committed rows are returned detached with their state still loaded.
+    """
+
+    def __init__(self, session_factory, window: float = 0.002, max_batch: int = 256):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="write-coalescer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Commit whatever is queued and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def submit(self, build) -> Future:
+        self.start()
+        future = Future()
+        self._queue.put((build, future))
+        return future
+
+    def add(self, build):
+        """Queue a row and block until its batch is committed"""
+        return self.submit(build).result()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                logger.exception("write batch failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit(self, batch):
+        db = self.session_factory()
+        try:
+            pending = []
+            for build, future in batch:
+                try:
+                    row = build()
+                except Exception as exc:
+                    future.set_exception(exc)
+                    continue
+                db.add(row)
+                pending.append((build, future, row))
+            if not pending:
+                return
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                self._commit_each(db, pending)
+                return
+            db.expunge_all()
+            for _, future, row in pending:
+                future.set_result(row)
+        finally:
+            db.close()
+
+    def _commit_each(self, db, pending):
+        for build, future, _ in pending:
+            row = build()
+            db.add(row)
+            try:
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                future.set_exception(exc)
+                continue
+            db.expunge(row)
+            future.set_result(row)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+
+import pytest
+
+# the engine is built when app.database is imported, point it at a scratch database first
+os.environ["APP_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='super_project_tests_')}/test.db"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.cache import NullCache, user_cache  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A session on empty tables, with the user cache out of the way"""
+    # rows are deleted rather than the tables dropped, the search index triggers stay in place
+    with engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    monkeypatch.setattr(user_cache, "backend", NullCache())
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def seed(db):
+    """Add `users` users with `items_per_user` items each, non-ASCII text,
+    quotes and NULL descriptions included
+    """
+    def seed(users: int = 3, items_per_user: int = 2):
+        first = db.query(models.User).count()
+        for n in range(first, first + users):
+            db.add(models.User(
+                email=f"user{n}@example.com",
+                hashed_password="notreallyhashed",
+                items=[
+                    models.Item(
+                        title=f"Item {n}.{i} \"quoted\" café",
+                        description=None if i % 2 else "lorem ipsum ☃ 日本語",
+                    )
+                    for i in range(items_per_user)
+                ],
+            ))
+        db.commit()
+    return seed
@@ -0,0 +1,21 @@
+"""The NDJSON exports stream a chunk per batch, one line per row"""
+import json
+
+import pytest
+
+from app.config import settings
+
+
+@pytest.mark.parametrize("export, listing", [("/export/items", "/items/"), ("/export/users", "/users/")])
+def test_export_lines_match_the_list_routes(client, seed, monkeypatch, export, listing):
+    # a batch size that does not divide the row count, the last chunk is partial
+    monkeypatch.setattr(settings, "export_chunk_size", 4)
+    seed(users=5, items_per_user=3)
+
+    response = client.get(export)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == client.get(listing).json()
@@ -0,0 +1,95 @@
+"""APP_FAST_JSON=1 must send the same bytes as the response_model path"""
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import List, Optional
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.config import settings
+from app.fast_json import dumps
+
+
+class Price(BaseModel):
+    amount: Decimal
+    currency: str
+
+
+class Line(BaseModel):
+    sku: str
+    price: Price
+    delivered_at: Optional[datetime] = None
+
+
+class Order(BaseModel):
+    id: int
+    placed_at: datetime
+    due: date
+    window: timedelta
+    note: str
+    lines: List[Line]
+
+
+def stock_body(content) -> bytes:
+    """What FastAPI sends for `content` once response_model validation is done"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        datetime(2022, 10, 18, 8, 59, 16),
+        datetime(2022, 10, 18, 8, 59, 16, 123456),
+        datetime(2022, 10, 18, 8, 59, 16, tzinfo=timezone.utc),
+        datetime(2022, 10, 18, 8, 59, 16, 500, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+        date(2022, 10, 18),
+        time(23, 59, 59, 999),
+        timedelta(days=1, seconds=5),
+        Decimal("1.10"),
+        Decimal("12345.678"),
+        Decimal("1E+2"),
+        "café ☃ 日本語 😀",
+        "\"quotes\" \\ back\\slash   \x1f control",
+        {"nested": [{"deeper": [1, 2.5, None, True]}], "ünïcode-key": "värde"},
+    ],
+    ids=repr,
+)
+def test_dumps_matches_stock_encoder(content):
+    assert dumps(content) == stock_body(content)
+
+
+def test_dumps_matches_stock_encoder_for_nested_models():
+    order = Order(
+        id=1,
+        placed_at=datetime(2022, 10, 18, 8, 59, 16, 123456, tzinfo=timezone.utc),
+        due=date(2022, 10, 20),
+        window=timedelta(hours=2),
+        note="livraison rapide, 速い",
+        lines=[
+            Line(sku="A-1", price=Price(amount=Decimal("9.99"), currency="EUR")),
+            Line(
+                sku="B-2",
+                price=Price(amount=Decimal("0.1"), currency="JPY"),
+                delivered_at=datetime(2022, 10, 19, 12, 0),
+            ),
+        ],
+    )
+    assert dumps(order) == stock_body(order)
+    assert dumps([order, order]) == stock_body([order, order])
+
+
+@pytest.mark.parametrize("path", ["/users/", "/items/", "/users/?limit=2&skip=1", "/items/?cursor="])
+def test_list_routes_send_the_same_bytes(client, seed, monkeypatch, path):
+    seed(users=4, items_per_user=3)
+
+    monkeypatch.setattr(settings, "fast_json", False)
+    regular = client.get(path)
+    monkeypatch.setattr(settings, "fast_json", True)
+    fast = client.get(path)
+
+    assert regular.status_code == fast.status_code == 200
+    assert fast.content == regular.content
+    assert fast.headers.get("x-next-cursor") == regular.headers.get("x-next-cursor")
+    assert regular.json()
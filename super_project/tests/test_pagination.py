@@ -0,0 +1,99 @@
+"""Keyset pagination of GET /items/ and GET /users/ through X-Next-Cursor"""
+import base64
+
+import pytest
+from sqlalchemy import event
+
+from app.database import engine
+from app.pagination import MAX_CURSOR_ID, encode_cursor
+
+
+@pytest.fixture
+def statements():
+    """The SQL statements and parameters run while the test is going"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def walk(client, path: str, limit: int):
+    """Every page of `path` following X-Next-Cursor, with the headers of the last one"""
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(path, params={"cursor": cursor, "limit": limit})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+    return pages
+
+
+@pytest.mark.parametrize("path, rows", [("/items/", 7 * 3), ("/users/", 7)])
+@pytest.mark.parametrize("limit", [1, 3, 7, 50])
+def test_cursor_pages_cover_every_row_once(client, seed, path, rows, limit):
+    seed(users=7, items_per_user=3)
+
+    pages = walk(client, path, limit)
+
+    ids = [row["id"] for page in pages for row in page]
+    assert ids == sorted(set(ids))
+    assert len(ids) == rows
+    # the page count is exact, even when the rows divide evenly into pages
+    assert len(pages) == max(1, -(-rows // limit))
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64 !!",
+        base64.urlsafe_b64encode(b"abc").decode(),
+        encode_cursor(-1),
+        encode_cursor(MAX_CURSOR_ID + 1),
+        base64.urlsafe_b64encode(b"9" * 30).decode(),
+    ],
+)
+@pytest.mark.parametrize("path", ["/items/", "/users/"])
+def test_invalid_cursor_is_a_400(client, seed, path, cursor):
+    seed(users=1, items_per_user=1)
+    response = client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_largest_cursor_is_an_empty_page(client, seed):
+    seed(users=1, items_per_user=1)
+    response = client.get("/items/", params={"cursor": encode_cursor(MAX_CURSOR_ID)})
+    assert response.status_code == 200
+    assert response.json() == []
+    assert "x-next-cursor" not in response.headers
+
+
+def test_deep_page_runs_the_same_indexed_query_as_the_first(client, seed, statements):
+    seed(users=20, items_per_user=10)
+    statements.clear()
+    first = client.get("/items/", params={"cursor": "", "limit": 5})
+    first_statements = list(statements)
+    statements.clear()
+    deep = client.get("/items/", params={"cursor": encode_cursor(190), "limit": 5})
+
+    assert [item["id"] for item in deep.json()] == [191, 192, 193, 194, 195]
+    assert first.status_code == deep.status_code == 200
+    # one statement, identical for both pages, only the bound id differs
+    assert len(first_statements) == len(statements) == 1
+    (first_sql, _), (deep_sql, deep_parameters) = first_statements[0], statements[0]
+    assert deep_sql == first_sql
+    assert "items.id > ?" in deep_sql
+    # SQLite always renders OFFSET after LIMIT, nothing is skipped though
+    assert deep_parameters == (190, 6, 0)
+
+    # seeks on the primary key instead of scanning and skipping rows
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {deep_sql}", deep_parameters)
+        plan = " ".join(row[-1] for row in rows)
+    assert "SEARCH" in plan and "PRIMARY KEY" in plan
@@ -0,0 +1,42 @@
+"""GET /users/ must not lazy load User.items once per user"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database import QueryBudgetExceeded
+from app.instrumentation import QueryInstrumentationMiddleware
+from app.main import app
+
+
+@pytest.fixture
+def counted_client(db, monkeypatch):
+    """A client whose responses carry X-DB-Query-Count"""
+    monkeypatch.setattr(settings, "debug", True)
+    monkeypatch.setattr(settings, "query_budget", 0)
+    with TestClient(QueryInstrumentationMiddleware(app)) as client:
+        yield client
+
+
+def statement_count(client, path: str) -> int:
+    response = client.get(path)
+    assert response.status_code == 200
+    return int(response.headers["x-db-query-count"])
+
+
+@pytest.mark.parametrize("path", ["/users/", "/users/?cursor="])
+def test_list_users_runs_a_constant_number_of_statements(counted_client, seed, path):
+    seed(users=1, items_per_user=1)
+    few = statement_count(counted_client, path)
+
+    seed(users=20, items_per_user=5)
+    many = statement_count(counted_client, path)
+
+    # the users, then every owner's items in one selectinload
+    assert few == many == 2
+
+
+def test_debug_mode_enforces_the_query_budget(counted_client, seed, monkeypatch):
+    seed(users=3, items_per_user=1)
+    monkeypatch.setattr(settings, "query_budget", 1)
+    with pytest.raises(QueryBudgetExceeded):
+        counted_client.get("/users/")
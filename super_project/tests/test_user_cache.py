@@ -0,0 +1,61 @@
+"""The user cache must never keep a row read before an invalidation"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.cache import MemoryCache, UserCache, user_cache
+
+
+def orm_user(user_id: int = 1, items=()):
+    return SimpleNamespace(id=user_id, email=f"user{user_id}@example.com", is_active=True, items=list(items))
+
+
+@pytest.fixture
+def cache():
+    return UserCache(MemoryCache())
+
+
+def test_loaded_user_is_cached(cache):
+    loads = []
+    cache.get_user(1, lambda: loads.append(1) or orm_user())
+    cache.get_user(1, lambda: loads.append(1) or orm_user())
+    assert len(loads) == 1
+    assert cache.lookup_user_by_email("user1@example.com").id == 1
+
+
+@pytest.mark.parametrize("by_email", [False, True])
+def test_invalidation_during_load_skips_the_store(cache, by_email):
+    def load():
+        # another request commits a change to the user while this one reads it
+        cache.invalidate_user(1)
+        return orm_user()
+
+    if by_email:
+        user = cache.get_user_by_email("user1@example.com", load)
+    else:
+        user = cache.get_user(1, load)
+
+    # the caller still gets the row it read, it is just not cached
+    assert user.id == 1
+    assert cache.lookup_user(1) is None
+    assert cache.lookup_user_by_email("user1@example.com") is None
+
+
+def test_version_taken_before_an_invalidation_is_stale(cache):
+    version = cache.version(1)
+    cache.invalidate_user(1)
+    cache.store(orm_user(), version)
+    assert cache.lookup_user(1) is None
+
+    cache.store(orm_user(), cache.version(1))
+    assert cache.lookup_user(1) is not None
+
+
+def test_new_item_shows_up_with_the_cache_on(client, monkeypatch):
+    monkeypatch.setattr(user_cache, "backend", MemoryCache())
+    user = client.post("/users/", json={"email": "cached@example.com", "password": "x"}).json()
+    assert client.get(f"/users/{user['id']}").json()["items"] == []
+
+    client.post(f"/users/{user['id']}/items/", json={"title": "new"})
+
+    assert [item["title"] for item in client.get(f"/users/{user['id']}").json()["items"]] == ["new"]